@@ -2,12 +2,13 @@ import numpy as np
 from scipy.ndimage import gaussian_filter
 import matplotlib.pyplot as plt
 
-def generate_smooth_city_matrix(size, smoothness=1.5):
+def generate_smooth_city_matrix(size, smoothness=1.5, seed=None):
     """
     Generates a realistic city layout matrix where higher density areas are clustered.
     - `smoothness`: Higher values create more gradual transitions between regions.
+    - `seed`: int, SeedSequence or Generator for the noise.
     """
-    raw_noise = np.random.rand(size, size)  # values between 0 and 1
+    raw_noise = np.random.default_rng(seed).random((size, size))  # values between 0 and 1
     smoothed = gaussian_filter(raw_noise, sigma=smoothness)
     normalized = (smoothed - smoothed.min()) / (smoothed.max() - smoothed.min())  # scale to 0-1
     city_matrix = (normalized * 9).astype(int)  # scale to 0–9 integer
@@ -0,0 +1,115 @@
+import heapq
+import math
+import numpy as np
+from Fire_simulation import (BURN_DURATION, BURNT, DEFAULT_STEPS, NEIGHBOR_OFFSETS, encode_grid, is_burning,
+                             ignite_random_tree, spread_tables)
+
+NEVER = -1
+UNIFORM_BATCH = 1 << 16
+
+class FireArrival:
+    """
+    Ignition times of a FireGrid fire computed event by event instead of step by step.
+    - A cell ignited at step t tries to spread to each neighbor at steps t + 1 .. t + BURN_DURATION - 1,
+      each try succeeding independently with the spread_table probability. The first success on
+      a link is a geometric delay, so it is drawn once and queued instead of trying every step.
+    - Events leave a priority queue in time order (a first-passage / Dijkstra sweep). A queued
+      ignition of a cell that has caught fire since is dropped: a neighbor's spread window always
+      ends before that cell could burn out and be ignitable again.
+    - Burned-out cells re-ignite as EMPTY land, as in FireGrid, so a cell can burn several times
+      (epochs); links into a cell that is burning or burned out start after its burn-out, at the
+      EMPTY probability.
+    The ignition times have the same distribution as stepping FireGrid (with the same terrain,
+    wind and slope); the cost is O(E log E) in the number of ignition events up to `steps`,
+    whatever the size of the map.
+    """
+
+    def __init__(self, forest_city_matrix, seed=None, fire_time=None,
+                 wind_direction=0.0, wind_speed=0.0, slope=0.0, slope_direction=0.0):
+        self.rng = np.random.default_rng(seed)
+        self.terrain, self.state = encode_grid(forest_city_matrix, fire_time)
+        if fire_time is None:
+            # Same start as FireGrid: one random tree
+            ignite_random_tree(self.terrain, self.state, self.rng)
+
+        self.spread_conditions = dict(wind_direction=wind_direction, wind_speed=wind_speed, slope=slope, slope_direction=slope_direction)
+
+    @classmethod
+    def from_fire_grid(cls, fire_grid, seed=None):
+        """Continue a FireGrid from its current state (same wind and slope; burned-out cells stay burned out)."""
+        arrival = cls(fire_grid.grid, seed=seed, fire_time=fire_grid.fire_time, **fire_grid.spread_conditions)
+        arrival.terrain, arrival.state = fire_grid.terrain, fire_grid.state.copy()
+        return arrival
+
+    def run(self, steps=DEFAULT_STEPS):
+        """
+        Ignition times up to `steps` steps ahead. Returns (first_ignition, ignitions):
+        - first_ignition: step at which each cell first catches fire, 0 for cells burning at the
+          start, NEVER (-1) for cells that don't burn
+        - ignitions: number of times each cell catches fire (re-ignitions included)
+        """
+        height, width = self.terrain.shape
+        terrain = self.terrain.ravel().tolist()
+        _, table, _ = spread_tables(self.terrain, **self.spread_conditions)
+        # log(1 - p) per [cell value + 1][direction]; a geometric delay is then ceil(log(u) / log(1 - p))
+        with np.errstate(divide="ignore"):
+            log_miss = np.log1p(-table).tolist()
+        window = BURN_DURATION - 1  # Steps a fire spreads for
+        rest = BURN_DURATION + 1    # Steps from an ignition until the cell can ignite again
+        neighbors = [(direction, dy * width + dx, dx) for direction, (dy, dx) in enumerate(NEIGHBOR_OFFSETS)]
+
+        state = self.state.ravel()
+        last_ignition = [None] * state.size
+        # Cells burned out before the start can ignite again right away, as EMPTY land
+        for cell in np.flatnonzero(state == BURNT).tolist():
+            last_ignition[cell] = -rest
+        first_ignition = [NEVER] * state.size
+        ignitions = [0] * state.size
+        cells = height * width
+        # Uniform draws for the delays, fetched from the generator in batches
+        uniforms = []
+
+        # A cell that has burned for `timer` steps at the start ignited at step 1 - timer
+        burning = np.flatnonzero(is_burning(state))
+        queue = list(zip((1 - state[burning].astype(int)).tolist(), burning.tolist()))
+        heapq.heapify(queue)
+
+        while queue:
+            time, cell = heapq.heappop(queue)
+            last = last_ignition[cell]
+            if last is not None and time < last + rest:
+                continue  # Caught fire since this ignition was queued
+            last_ignition[cell] = time
+            if first_ignition[cell] == NEVER:
+                first_ignition[cell] = time if time > 0 else 0
+            ignitions[cell] += 1
+
+            # Spread tries happen at steps after both this ignition and the start of the run
+            first_try = time + 1 if time > 0 else 1
+            last_try = time + window if time + window < steps else steps
+            x = cell % width
+            for direction, offset, dx in neighbors:
+                target = cell + offset
+                if not (0 <= x + dx < width and 0 <= target < cells):
+                    continue
+                target_last = last_ignition[target]
+                if target_last is None:
+                    start, level = first_try, terrain[target]
+                else:
+                    start, level = target_last + rest, 0
+                    if start < first_try:
+                        start = first_try
+                if start > last_try:
+                    continue
+                miss = log_miss[level + 1][direction]
+                if miss == 0.0:
+                    continue  # Can't spread along this link
+                if not uniforms:
+                    uniforms = self.rng.random(UNIFORM_BATCH).tolist()
+                # ceil(log(u) / log(1 - p)) - 1 >= 0 steps after `start`; p = 1 always hits at once
+                when = start if miss == -math.inf else start + math.ceil(math.log(1.0 - uniforms.pop()) / miss) - 1
+                if when <= last_try:
+                    heapq.heappush(queue, (when if when >= start else start, target))
+
+        return (np.array(first_ignition, dtype=np.int32).reshape(height, width),
+                np.array(ignitions, dtype=np.int32).reshape(height, width))
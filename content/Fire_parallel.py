@@ -0,0 +1,97 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Lock, shared_memory
+from Fire_simulation import FireGrid, DEFAULT_ENGINE
+from Firethreat import fire_statistics
+
+# Per-process state set up once by _init_worker
+_worker = {}
+
+def _attach(name, shape, dtype):
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+def _init_worker(forest_city_matrix, fire_time, engine, spread_conditions, steps, runs, first_burn_name, burning_steps_name, lock):
+    _worker.update(grid=forest_city_matrix, fire_time=fire_time, engine=engine, spread_conditions=spread_conditions, steps=steps, lock=lock)
+    _worker["first_burn_block"], _worker["first_burn"] = _attach(first_burn_name, (runs,) + forest_city_matrix.shape, np.int16)
+    _worker["burning_steps_block"], _worker["burning_steps"] = _attach(burning_steps_name, forest_city_matrix.shape, np.int64)
+
+def _run_chunk(run_ids, seeds):
+    """Simulate a few runs and merge their statistics into the shared arrays."""
+    steps = _worker["steps"]
+    never = steps + 1
+    burning_steps = np.zeros(_worker["grid"].shape, dtype=np.int64)
+
+    for run_id, seed in zip(run_ids, seeds):
+        fire_sim = FireGrid(_worker["grid"], engine=_worker["engine"], seed=seed, fire_time=_worker["fire_time"], **_worker["spread_conditions"])
+
+        # Each run owns its slice of first_burn, so no locking is needed for it
+        first_burn = _worker["first_burn"][run_id]
+        first_burn[...] = np.where(fire_sim.burning, 0, never)
+        for step in range(1, steps + 1):
+            fire_sim.step()
+            burning_now = fire_sim.burning
+            burning_steps += burning_now
+            np.putmask(first_burn, burning_now & (first_burn == never), step)
+
+    # Integer sums don't depend on the order the chunks finish in
+    with _worker["lock"]:
+        _worker["burning_steps"] += burning_steps
+    return len(run_ids)
+
+def run_parallel_ensemble(forest_city_matrix, city, runs, steps, seed, workers=None, fire_time=None,
+                          engine=DEFAULT_ENGINE, quantiles=(0.1, 0.5, 0.9), **spread_conditions):
+    """
+    Simulates `runs` independent fires for `steps` steps on a process pool and returns the same
+    per-cell statistics as Firethreat.simulate_fire_ensemble.
+    - Run i always draws from child i of SeedSequence(seed), so a seed gives bit-identical
+      results for any number of workers.
+    - Pass fire_time (with the FIRE cells already in forest_city_matrix) to continue an existing
+      fire; otherwise every run ignites its own random tree.
+    - Workers write first-burn steps and burning-step counts straight into shared memory instead
+      of sending grids back.
+    - Extra keyword arguments (wind_direction, wind_speed, slope, slope_direction) go to FireGrid.
+    """
+    workers = workers or os.cpu_count()
+    forest_city_matrix = np.asarray(forest_city_matrix)
+    run_seeds = np.random.SeedSequence(seed).spawn(runs)
+
+    first_burn_block = shared_memory.SharedMemory(create=True, size=runs * forest_city_matrix.size * np.dtype(np.int16).itemsize)
+    burning_steps_block = shared_memory.SharedMemory(create=True, size=forest_city_matrix.size * np.dtype(np.int64).itemsize)
+    try:
+        first_burn = np.ndarray((runs,) + forest_city_matrix.shape, dtype=np.int16, buffer=first_burn_block.buf)
+        burning_steps = np.ndarray(forest_city_matrix.shape, dtype=np.int64, buffer=burning_steps_block.buf)
+        burning_steps[...] = 0
+
+        init_args = (forest_city_matrix, fire_time, engine, spread_conditions, steps, runs, first_burn_block.name, burning_steps_block.name, Lock())
+        chunks = np.array_split(np.arange(runs), min(runs, 4 * workers))
+        if workers == 1:
+            _init_worker(*init_args)
+            for chunk in chunks:
+                _run_chunk(chunk, [run_seeds[i] for i in chunk])
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+                list(pool.map(_run_chunk, chunks, [[run_seeds[i] for i in chunk] for chunk in chunks]))
+
+        return fire_statistics(first_burn, burning_steps.copy(), city, runs, steps, quantiles)
+    finally:
+        # Drop every view of the blocks so they can be closed
+        first_burn = burning_steps = None
+        _worker.clear()
+        for block in (first_burn_block, burning_steps_block):
+            block.close()
+            block.unlink()
+
+# EXAMPLE USAGE
+if __name__ == "__main__":
+    from Forest import generate_clumpy_forest
+    from Forest_City import generate_large_cluster_city_matrix
+
+    rng = np.random.default_rng(42)
+    forest = generate_clumpy_forest(250, clump_scale=35, tree_ratio=0.5, seed=rng)
+    city = generate_large_cluster_city_matrix(250, forest, smoothness=50, distance_influence=0.2, center_bias=1.3, seed=rng)
+
+    stats = run_parallel_ensemble(city, city, runs=64, steps=200, seed=42)
+    print("Mean burn probability:", stats["burn_probability"].mean())
+    print("Expected population burned:", stats["expected_population_burned"].sum())
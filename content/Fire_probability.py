@@ -0,0 +1,123 @@
+import numpy as np
+from Fire_simulation import BURN_DURATION, NEIGHBOR_OFFSETS, encode_grid, spread_tables
+
+class FireProbability:
+    """
+    Mean-field version of FireGrid: instead of one random fire, every cell carries the
+    probability of each of its states, and one step moves those probabilities through the
+    same spread table, BURN_DURATION and burn-out rules.
+    - States: unburnt, burning for 1..BURN_DURATION steps, burned out (which can re-ignite
+      as EMPTY land, like in FireGrid).
+    - A cell's chance to ignite is 1 - prod(1 - spread * P(neighbor spreading)) over its 8
+      neighbors, i.e. neighbors are treated as independent. That ignores the correlation
+      between a cell and the neighbor that would have lit it, so the front spreads somewhat
+      faster and wider than in the stochastic model (see validate_against_ensemble).
+    One step costs a few whole-grid passes and gives the expectation an ensemble of
+    thousands of runs would only estimate.
+    """
+
+    def __init__(self, forest_city_matrix, fire_time=None, wind_direction=0.0, wind_speed=0.0, slope=0.0, slope_direction=0.0):
+        self.terrain, state = encode_grid(forest_city_matrix, fire_time)
+        h, w = state.shape
+        self.unburnt = (state == 0).astype(np.float32)
+        self.burnt = np.zeros((h, w), dtype=np.float32)
+        # Ring of BURN_DURATION layers: _timers[(_head + k) % BURN_DURATION] is the probability of
+        # having burned for k + 1 steps, so aging every fire by one step is moving _head
+        self._timers = np.stack([(state == k).astype(np.float32) for k in range(1, BURN_DURATION + 1)])
+        self._head = 0
+
+        self.spread_conditions, table, _ = spread_tables(
+            self.terrain, wind_direction=wind_direction, wind_speed=wind_speed, slope=slope, slope_direction=slope_direction)
+        table = table.astype(np.float32)
+        # Per-direction spread into every cell as it stands (terrain) and once burned out (EMPTY)
+        self._spread_terrain = np.ascontiguousarray(np.moveaxis(table[self.terrain.astype(np.intp) + 1], -1, 0))
+        self._spread_empty = table[1]
+        self._spreading = np.zeros((h + 2, w + 2), dtype=np.float32)
+
+    @classmethod
+    def from_fire_grid(cls, fire_grid):
+        """Start from the current state of a FireGrid (same wind and slope), like FireEnsemble.from_fire_grid."""
+        return cls(fire_grid.grid, fire_time=fire_grid.fire_time, **fire_grid.spread_conditions)
+
+    def _timer_layer(self, burn_time):
+        return self._timers[(self._head + burn_time - 1) % BURN_DURATION]
+
+    @property
+    def burning(self):
+        """Probability that each cell is burning."""
+        return self._timers.sum(axis=0)
+
+    @property
+    def burn_probability(self):
+        """Probability that each cell has burned at some point (is no longer unburnt)."""
+        return 1 - self.unburnt
+
+    def step(self):
+        """Advance one step; returns the probability that each cell ignites in it."""
+        h, w = self.unburnt.shape
+        burning_out = self._timer_layer(BURN_DURATION)
+        spreading = self._spreading
+        np.subtract(self._timers.sum(axis=0), burning_out, out=spreading[1:-1, 1:-1])  # A cell spreads until its last step
+
+        survive_unburnt = np.ones((h, w), dtype=np.float32)
+        survive_burnt = np.ones((h, w), dtype=np.float32)
+        factor = np.empty((h, w), dtype=np.float32)
+        for direction, (dy, dx) in enumerate(NEIGHBOR_OFFSETS):
+            # The neighbor spreading along (dy, dx) into a cell sits at (-dy, -dx) from it
+            neighbor = spreading[1 - dy:1 - dy + h, 1 - dx:1 - dx + w]
+            np.multiply(self._spread_terrain[direction], neighbor, out=factor)
+            np.subtract(1, factor, out=factor)
+            survive_unburnt *= factor
+            survive_burnt *= 1 - self._spread_empty[direction] * neighbor
+
+        ignited = self.unburnt * (1 - survive_unburnt) + self.burnt * (1 - survive_burnt)
+        self.unburnt *= survive_unburnt
+        self.burnt *= survive_burnt
+        self.burnt += burning_out
+
+        # The layer that burned out is reused for the new fires, which are now 1 step old
+        self._head = (self._head - 1) % BURN_DURATION
+        self._timers[self._head] = ignited
+        return ignited
+
+def propagate_fire_probability(fire_sim, city, steps, quantiles=(0.1, 0.5, 0.9)):
+    """
+    Expected-value counterpart of Firethreat.simulate_fire_ensemble from one deterministic pass:
+    - burn_probability: probability each cell burns within `steps` steps
+    - expected_population_burned: burn_probability weighted by population density
+    - pop_fire_danger: expected population-weighted burning steps
+    - time_to_burn: step by which each cell has burned with each quantile's probability (NaN = not reached)
+    """
+    model = FireProbability.from_fire_grid(fire_sim)
+    population = np.clip(city, 0, None)
+
+    burning_steps = np.zeros(city.shape)
+    time_to_burn = {q: np.where(model.burn_probability >= q, 0.0, np.nan) for q in quantiles}
+    for step in range(1, steps + 1):
+        model.step()
+        burning_steps += model.burning
+        reached = model.burn_probability
+        for q, times in time_to_burn.items():
+            times[np.isnan(times) & (reached >= q)] = step
+
+    burn_probability = model.burn_probability
+    return {
+        "burn_probability": burn_probability,
+        "expected_population_burned": burn_probability * population,
+        "pop_fire_danger": burning_steps * city,
+        "time_to_burn": time_to_burn,
+    }
+
+def validate_against_ensemble(fire_sim, city, steps, members=1000, seed=None):
+    """Mean absolute and worst per-cell differences between the mean-field maps and a Monte Carlo ensemble."""
+    from Firethreat import simulate_fire_ensemble
+    expected = propagate_fire_probability(fire_sim, city, steps)
+    sampled = simulate_fire_ensemble(fire_sim, city, steps, members=members, seed=seed)
+    report = {}
+    for key in ("burn_probability", "pop_fire_danger"):
+        difference = np.abs(expected[key] - sampled[key])
+        scale = max(float(np.abs(sampled[key]).max()), 1e-12)
+        report[key] = {"mean_abs": float(difference.mean()), "max_abs": float(difference.max()),
+                       "mean_abs_relative": float(difference.mean() / scale)}
+    report["expected_burned_cells"] = (float(expected["burn_probability"].sum()), float(sampled["burn_probability"].sum()))
+    return report
@@ -0,0 +1,193 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+from Fire_simulation import BURN_DURATION, BURNT, TREE, FIRE, FireSnapshot, decode_grid, is_burning
+
+DEFAULT_KEYFRAME_INTERVAL = 50
+NEVER = -1
+
+class FireRecorder:
+    """
+    History of a FireGrid run as an event log instead of per-step frames.
+    - Each step stores the flat indices of the cells that caught fire, in the smallest unsigned
+      dtype that addresses the map (uint16 up to 256x256). Burn-outs need no record: with a
+      fixed BURN_DURATION a cell ignited at step s burns out at step s + BURN_DURATION.
+    - Every `keyframe_interval` steps the burning and burned-out cells are kept as a
+      FireSnapshot, so any step is rebuilt from the nearest keyframe and the events after it.
+    Memory grows with the number of ignitions, not with map area x steps. The log assumes the
+    grid is only stepped while recording (no grid/fire_time edits or restore() in between).
+
+        recorder = FireRecorder(fire_sim)
+        for _ in range(350):
+            recorder.step()
+        recorder.save_animation("fire.gif", stride=5)
+    """
+
+    def __init__(self, fire_grid, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        self.fire_grid = fire_grid
+        self.terrain = fire_grid.terrain
+        self.keyframe_interval = keyframe_interval
+        self.index_dtype = np.min_scalar_type(max(self.terrain.size - 1, 0))
+        self.keyframes = {0: self._keyframe()}
+        self._events = []     # per step: ignited flat indices
+        self._packed = None   # (events, offsets) cache of the concatenated log
+
+    @property
+    def steps(self):
+        return len(self._events)
+
+    def step(self):
+        """Step the recorded grid and log it; returns the ignited cells like FireGrid.step."""
+        ignited = self.fire_grid.step()
+        self.record(ignited)
+        return ignited
+
+    def record(self, ignited=None):
+        """Log one step of a grid stepped elsewhere (`ignited`: what its step() returned)."""
+        if ignited is None:
+            ignited = np.flatnonzero(self.fire_grid.state == 1)
+        self._events.append(np.asarray(ignited).astype(self.index_dtype))
+        self._packed = None
+        if self.steps % self.keyframe_interval == 0:
+            self.keyframes[self.steps] = self._keyframe()
+
+    def _keyframe(self):
+        snapshot = FireSnapshot(self.fire_grid.state, None)
+        snapshot.cells = snapshot.cells.astype(self.index_dtype)
+        return snapshot
+
+    def _log(self):
+        # All ignitions in step order, and offsets[s] = where step s + 1's ignitions start
+        if self._packed is None:
+            counts = [len(events) for events in self._events]
+            offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            events = np.concatenate(self._events) if self._events else np.zeros(0, dtype=self.index_dtype)
+            self._packed = events, offsets
+        return self._packed
+
+    def _window(self, first, last):
+        """(cells, steps) of the ignitions in steps first + 1 .. last, in step order."""
+        events, offsets = self._log()
+        cells = events[offsets[first]:offsets[last]].astype(np.intp)
+        steps = np.repeat(np.arange(first + 1, last + 1), np.diff(offsets[first:last + 1]))
+        return cells, steps
+
+    def _check_step(self, step):
+        if not 0 <= step <= self.steps:
+            raise ValueError(f"Step {step} is outside the recorded 0..{self.steps}.")
+
+    def state_at(self, step):
+        """FireGrid.state (compact layout) after `step` recorded steps."""
+        self._check_step(step)
+        keyframe = step - step % self.keyframe_interval
+        snapshot = self.keyframes[keyframe]
+        state = snapshot.to_state().ravel()
+
+        # Fires burning at the keyframe keep ageing, then burn out
+        burning = snapshot.cells[is_burning(snapshot.values)].astype(np.intp)
+        timers = state[burning].astype(int) + step - keyframe
+        state[burning] = np.where(timers > BURN_DURATION, BURNT, timers)
+
+        # A cell's last ignition since the keyframe decides its state
+        cells, steps = self._window(keyframe, step)
+        cells, last = np.unique(cells[::-1], return_index=True)
+        timers = step - steps[::-1][last] + 1
+        state[cells] = np.where(timers > BURN_DURATION, BURNT, timers)
+        return state.reshape(self.terrain.shape)
+
+    def grid_at(self, step):
+        """Cell values (TREE, densities, FIRE) after `step` recorded steps, as FireGrid.grid."""
+        return decode_grid(self.terrain, self.state_at(step))
+
+    def burned_by(self, step):
+        """Cells that are burning or burned out after `step` recorded steps."""
+        return self.state_at(step) != 0
+
+    def ignitions_per_step(self):
+        return np.diff(self._log()[1])
+
+    def first_ignition(self):
+        """Step at which each cell first caught fire: 0 if burning at the start, NEVER (-1) if it didn't."""
+        first = np.full(self.terrain.size, NEVER, dtype=np.int32)
+        cells, steps = self._window(0, self.steps)
+        cells, index = np.unique(cells, return_index=True)
+        first[cells] = steps[index]
+        initial = self.keyframes[0]
+        first[initial.cells[is_burning(initial.values)]] = 0
+        return first.reshape(self.terrain.shape)
+
+    def burning_steps(self, until=None):
+        """How many of steps 1..until (default: all) each cell ended burning; times the city, the danger of Firethreat."""
+        until = self.steps if until is None else until
+        self._check_step(until)
+        cells, steps = self._window(0, until)
+        totals = np.bincount(cells, weights=np.minimum(BURN_DURATION, until - steps + 1), minlength=self.terrain.size)
+
+        # Cells burning at the start, for their remaining BURN_DURATION - timer steps
+        initial = self.keyframes[0]
+        burning = is_burning(initial.values)
+        totals[initial.cells[burning]] += np.minimum(BURN_DURATION - initial.values[burning].astype(int), until)
+        return totals.reshape(self.terrain.shape)
+
+    def frames(self, start=0, stop=None, stride=1):
+        """(step, grid) pairs for offline rendering."""
+        stop = self.steps if stop is None else stop
+        for step in range(start, stop + 1, stride):
+            yield step, self.grid_at(step)
+
+    def save_animation(self, path, start=0, stop=None, stride=1, fps=10):
+        """Render the recorded run to a movie (.gif with Pillow, else the default matplotlib writer)."""
+        frames = list(range(start, (self.steps if stop is None else stop) + 1, stride))
+        fig, ax = plt.subplots(figsize=(6, 6))
+        ax.axis('off')
+        imshow_obj = ax.imshow(self._display(frames[0]), cmap="hot", vmin=-1, vmax=10)
+
+        def draw(step):
+            imshow_obj.set_array(self._display(step))
+            ax.set_title(f"Fire Spread Step {step}")
+            return (imshow_obj,)
+
+        animation = FuncAnimation(fig, draw, frames=frames, blit=False)
+        animation.save(path, fps=fps, writer="pillow" if path.endswith(".gif") else None)
+        plt.close(fig)
+        return path
+
+    def _display(self, step):
+        # Same colors as FireGrid.visualize
+        display_grid = self.grid_at(step)
+        display_grid[display_grid == TREE] = -1
+        display_grid[display_grid == FIRE] = 10
+        return display_grid
+
+    def save(self, path):
+        """Write the log (terrain, ignitions, keyframes) to an .npz file."""
+        events, offsets = self._log()
+        steps = sorted(self.keyframes)
+        np.savez_compressed(
+            path, terrain=self.terrain, events=events, offsets=offsets, keyframe_interval=self.keyframe_interval,
+            keyframe_steps=steps, keyframe_sizes=[len(self.keyframes[step].cells) for step in steps],
+            keyframe_cells=np.concatenate([self.keyframes[step].cells for step in steps]),
+            keyframe_values=np.concatenate([self.keyframes[step].values for step in steps]))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """A recorder for replay and queries from a saved log (it can't record further steps)."""
+        data = np.load(path)
+        recorder = cls.__new__(cls)
+        recorder.fire_grid = None
+        recorder.terrain = data["terrain"]
+        recorder.keyframe_interval = int(data["keyframe_interval"])
+        recorder.index_dtype = data["events"].dtype
+        offsets = data["offsets"]
+        recorder._events = np.split(data["events"], offsets[1:-1])
+        recorder._packed = data["events"], offsets
+
+        recorder.keyframes = {}
+        bounds = np.concatenate([[0], np.cumsum(data["keyframe_sizes"])])
+        for step, begin, end in zip(data["keyframe_steps"], bounds[:-1], bounds[1:]):
+            state = np.zeros(recorder.terrain.shape, dtype=np.uint8)
+            state.ravel()[data["keyframe_cells"][begin:end]] = data["keyframe_values"][begin:end]
+            recorder.keyframes[int(step)] = FireSnapshot(state, None)
+        return recorder
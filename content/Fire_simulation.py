@@ -1,5 +1,8 @@
+import copy
+import time
 import numpy as np
 import matplotlib.pyplot as plt
+import instrumentation
 
 # Constants for visualization
 TREE = -1
@@ -12,75 +15,304 @@ EMPTY_SPREAD_PROB = 0.02
 SPREAD_DENSITY_SCALE = 0.55  # Tune this value to control influence of population density
 BURN_DURATION = 10
 DEFAULT_STEPS = 250
+DEFAULT_ENGINE = "vectorized"  # "loop" keeps the original per-cell reference implementation
+BURNT = 255  # Cell state once burned out; the cell then behaves as EMPTY land
+MEMBER_BITS = 64        # FireEnsemble members packed into one uint64 word per cell
+
+# Wind and slope spread factors (Alexandridis et al., 2008); wind speed in m/s, slope in degrees
+WIND_SPEED_FACTOR = 0.045
+WIND_DIRECTION_FACTOR = 0.131
+SLOPE_FACTOR = 0.078
+
+# (dy, dx) offsets of the 8 neighbors a burning cell can spread to; the list index is the
+# direction number used by the spread tables and as the bit in neighbor patterns
+NEIGHBOR_OFFSETS = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if (dy, dx) != (0, 0)]
+NEIGHBOR_DY, NEIGHBOR_DX = np.array(NEIGHBOR_OFFSETS).T
+NEIGHBOR_PATTERNS = 1 << len(NEIGHBOR_OFFSETS)
 
 def wind_vector_components(angle_degrees):
     """Convert angle in degrees (0 = right, 90 = up) to normalized (dy, dx)."""
     radians = np.radians(angle_degrees)
     return -np.sin(radians), np.cos(radians)
 
+def spread_probability(target):
+    """Per-neighbor ignition probability for cells holding TREE or a population density."""
+    density = np.clip(target, 0, None)
+    prob = EMPTY_SPREAD_PROB * (1 + density * SPREAD_DENSITY_SCALE)
+    return np.where(target == TREE, TREE_SPREAD_PROB, prob)
+
+def direction_multipliers(wind_direction=0.0, wind_speed=0.0, slope=0.0, slope_direction=0.0):
+    """
+    Spread multiplier for each direction in NEIGHBOR_OFFSETS.
+    - wind_direction: angle the wind blows towards (0 = right, 90 = up), wind_speed in m/s
+    - slope: terrain slope in degrees, rising towards slope_direction (same angle convention)
+    With no wind and a flat map every multiplier is 1.
+    """
+    offsets = np.array(NEIGHBOR_OFFSETS, dtype=float)
+    offsets /= np.linalg.norm(offsets, axis=1)[:, None]
+
+    wind_cos = offsets @ np.array(wind_vector_components(wind_direction))
+    wind = np.exp(WIND_SPEED_FACTOR * wind_speed) * np.exp(WIND_DIRECTION_FACTOR * wind_speed * (wind_cos - 1))
+
+    # Slope angle seen when moving along each direction of a tilted plane
+    upslope_cos = offsets @ np.array(wind_vector_components(slope_direction))
+    slope_along = np.degrees(np.arctan(np.tan(np.radians(slope)) * upslope_cos))
+    return wind * np.exp(SLOPE_FACTOR * slope_along)
+
+def spread_table(max_level, multipliers):
+    """Per-neighbor spread probability indexed by [cell value + 1, direction]."""
+    levels = np.arange(TREE, max_level + 1)
+    return np.clip(spread_probability(levels)[:, None] * multipliers[None, :], 0, 1)
+
+def ignition_table(spread):
+    """Ignition probability indexed by [cell value + 1, neighbor pattern] from a spread_table."""
+    # Bit d of a pattern is set when the neighbor spreading along direction d is burning;
+    # every such neighbor gets its own independent chance to ignite the cell
+    bits = (np.arange(NEIGHBOR_PATTERNS)[:, None] >> np.arange(len(NEIGHBOR_OFFSETS))) & 1
+    log_survive = np.log1p(-np.minimum(spread, 1 - 1e-12))
+    return 1 - np.exp(log_survive @ bits.T)
+
+def spread_tables(terrain, wind_direction=0.0, wind_speed=0.0, slope=0.0, slope_direction=0.0, max_level=None):
+    """(spread_conditions, spread_table, ignition_table) of a scenario; max_level defaults to terrain's highest density."""
+    spread_conditions = dict(wind_direction=wind_direction, wind_speed=wind_speed, slope=slope, slope_direction=slope_direction)
+    if max_level is None:
+        max_level = max(int(terrain.max()), 0) if terrain.size else 0
+    spread = spread_table(max_level, direction_multipliers(**spread_conditions))
+    return spread_conditions, spread, ignition_table(spread)
+
+def burning_neighbor_pattern(spreading):
+    """Bit pattern of the spreading 8-neighbors of every cell, from shifted views (works on (..., H, W) arrays)."""
+    h, w = spreading.shape[-2:]
+    padded = np.zeros(spreading.shape[:-2] + (h + 2, w + 2), dtype=np.uint8)
+    padded[..., 1:-1, 1:-1] = spreading
+    pattern = np.zeros(spreading.shape, dtype=np.uint8)
+    shifted = np.empty(spreading.shape, dtype=np.uint8)
+    for direction, (dy, dx) in enumerate(NEIGHBOR_OFFSETS):
+        # The neighbor spreading along (dy, dx) into a cell sits at (-dy, -dx) from it
+        np.left_shift(padded[..., 1 - dy:1 - dy + h, 1 - dx:1 - dx + w], direction, out=shifted)
+        pattern |= shifted
+    return pattern
+
+def encode_grid(forest_city_matrix, fire_time=None):
+    """Split a cell-value matrix (TREE, densities, FIRE) into the compact (terrain, state) pair."""
+    # terrain: read-only int8 TREE/density layer. state: one uint8 per cell, 0 = unburnt,
+    # 1..BURN_DURATION = burning for that many steps, BURNT = burned out (behaves as EMPTY)
+    matrix = np.asarray(forest_city_matrix)
+    burning = matrix == FIRE
+    terrain = np.where(burning, 0, matrix)
+    if terrain.size and (terrain.min() < TREE or terrain.max() > np.iinfo(np.int8).max):
+        raise ValueError("Cell values must be TREE, FIRE or a population density between 0 and 127.")
+    if terrain.dtype.kind not in "biu" and (terrain != np.round(terrain)).any():
+        raise ValueError("Population densities must be whole numbers (the terrain is stored as int8).")
+    terrain = terrain.astype(np.int8)
+    terrain.flags.writeable = False
+
+    state = np.zeros(matrix.shape, dtype=np.uint8)
+    timers = 1 if fire_time is None else np.clip(np.asarray(fire_time)[burning], 1, BURN_DURATION)
+    state[burning] = timers
+    return terrain, state
+
+def ignite_random_tree(terrain, state, rng):
+    """Set a random TREE cell of terrain burning in state, one per member for (K, H, W) states; returns the flat indices."""
+    tree_indices = np.flatnonzero(terrain == TREE)
+    if len(tree_indices) == 0:
+        raise ValueError("No trees found in the city matrix. Ensure that your city matrix contains trees marked by the TREE constant.")
+    if state.ndim == terrain.ndim:
+        start = tree_indices[rng.choice(len(tree_indices))]
+        state.flat[start] = 1
+        return start
+    members = state.shape[0]
+    starts = tree_indices[rng.choice(len(tree_indices), size=members)]
+    state.reshape(members, -1)[np.arange(members), starts] = 1
+    return starts
+
+def is_burning(state):
+    return (state >= 1) & (state <= BURN_DURATION)
+
+def decode_grid(terrain, state):
+    """Cell values in the original layout: terrain, 0 once burned out, FIRE while burning."""
+    grid = np.where(state == 0, terrain, np.int8(0))
+    grid[is_burning(state)] = FIRE
+    return grid
+
+def decode_fire_time(state):
+    """Steps each cell has been burning for, 0 for cells that aren't burning."""
+    return np.where(is_burning(state), state, np.uint8(0))
+
+def _target_level(terrain, state, cells):
+    # Cell value an unburnt candidate (flat index into state) burns as; burned-out cells are EMPTY.
+    # As np.intp, since level + 1 (the table row) overflows int8 for a density of 127
+    level = terrain.ravel()[cells if state.size == terrain.size else cells % terrain.size]
+    return np.where(state[cells] == BURNT, 0, level.astype(np.intp))
+
+def advance_fire(terrain, state, table, rng):
+    """Advance state (shape (..., H, W), C-contiguous) over terrain (H, W) by one step in place; returns the ignited flat indices."""
+    # Whole-array version of FireGrid._step_loop: the pattern of spreading neighbors around a cell
+    # selects its ignition probability from the precomputed table, so no per-cell arithmetic is left
+    shape = state.shape
+    state = state.ravel()
+    burning = is_burning(state)
+    spreading = burning & (state < BURN_DURATION)
+    burned_out = np.flatnonzero(state == BURN_DURATION)
+
+    pattern = burning_neighbor_pattern(spreading.reshape(shape)).ravel()
+    np.putmask(pattern, burning, 0)  # Burning cells can't be re-ignited
+    candidates = np.flatnonzero(pattern)
+    prob = table[_target_level(terrain, state, candidates) + 1, pattern[candidates]]
+    ignited = candidates[rng.random(len(candidates)) < prob]  # One batch of draws for the whole step
+
+    state += spreading
+    state[burned_out] = BURNT
+    state[ignited] = 1
+    return ignited
+
+def advance_fire_sparse(terrain, state, active, table, rng):
+    """Same step as advance_fire, touching only the burning cells (flat indices in `active`) and their neighbors."""
+    # Cost is O(fire perimeter) instead of O(map area); returns the new burning set
+    height, width = state.shape[-2:]
+    state = state.ravel()
+
+    timers = state[active]
+    spreading = active[timers < BURN_DURATION]
+    burned_out = active[timers == BURN_DURATION]
+
+    # All 8 neighbors of every spreading cell, dropping the ones that fall off their map
+    xs = spreading % width
+    ys = spreading // width % height
+    ny = ys[:, None] + NEIGHBOR_DY
+    nx = xs[:, None] + NEIGHBOR_DX
+    inside = (ny >= 0) & (ny < height) & (nx >= 0) & (nx < width)
+    neighbors = (spreading[:, None] + NEIGHBOR_DY * width + NEIGHBOR_DX)[inside]
+    bits = np.broadcast_to(1 << np.arange(len(NEIGHBOR_OFFSETS)), inside.shape)[inside]
+    unburnt = ~is_burning(state[neighbors])
+    neighbors, bits = neighbors[unburnt], bits[unburnt]
+
+    # Each direction reaches a given neighbor from at most one cell, so summing bits builds its pattern
+    candidates, inverse = np.unique(neighbors, return_inverse=True)
+    pattern = np.bincount(inverse, weights=bits, minlength=len(candidates)).astype(np.intp)
+    prob = table[_target_level(terrain, state, candidates) + 1, pattern]
+    ignited = candidates[rng.random(len(candidates)) < prob]
+
+    state[spreading] += 1
+    state[burned_out] = BURNT
+    state[ignited] = 1
+    return np.concatenate([spreading, ignited])
+
 class FireGrid:
-    def __init__(self, forest_city_matrix):
-        self.grid = forest_city_matrix.copy()
-        self.fire_time = np.zeros_like(self.grid, dtype=int)
+    def __init__(self, forest_city_matrix, engine=DEFAULT_ENGINE, seed=None, fire_time=None,
+                 wind_direction=0.0, wind_speed=0.0, slope=0.0, slope_direction=0.0):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown fire engine '{engine}'. Choose one of: {', '.join(self.ENGINES)}.")
+        self.engine = engine
+        # Every random draw of this fire comes from its own generator (seed: int, SeedSequence or Generator)
+        self.rng = np.random.default_rng(seed)
+
+        # Two bytes per cell: read-only terrain plus a state byte (see encode_grid). grid and
+        # fire_time are rebuilt from them on access. Pass fire_time to continue an existing fire
+        # whose FIRE cells are already in forest_city_matrix.
+        self.terrain, self.state = encode_grid(forest_city_matrix, fire_time)
+
+        if fire_time is None:
+            # Randomly select a tree to ignite
+            ignite_random_tree(self.terrain, self.state, self.rng)
+
+        # Flat indices of the burning cells, only tracked by the "sparse" engine
+        self._active = None
+
+        # Spread probabilities for every (cell value, direction) pair and ignition probabilities for
+        # every (cell value, burning neighbor pattern) pair, computed once for this scenario
+        self.spread_conditions, self._spread_table, self._ignition_table = spread_tables(
+            self.terrain, wind_direction=wind_direction, wind_speed=wind_speed, slope=slope, slope_direction=slope_direction)
+
+    @property
+    def grid(self):
+        return decode_grid(self.terrain, self.state)
 
-        # Find a TREE to ignite
-        tree_indices = np.argwhere(self.grid == TREE)
+    @grid.setter
+    def grid(self, forest_city_matrix):
+        # Cells that stay on FIRE keep their timers. The tables are rebuilt, as the new map may
+        # hold higher densities than the rows they have
+        self.terrain, self.state = encode_grid(forest_city_matrix, self.fire_time)
+        self._active = None
+        _, self._spread_table, self._ignition_table = spread_tables(self.terrain, **self.spread_conditions)
 
-        # Check if tree_indices is empty
-        if len(tree_indices) == 0:
-            raise ValueError("No trees found in the city matrix. Ensure that your city matrix contains trees marked by the TREE constant.")
+    @property
+    def fire_time(self):
+        return decode_fire_time(self.state)
 
-        # Randomly select a tree to ignite
-        y, x = tree_indices[np.random.choice(len(tree_indices))]  # Randomly select a tree to ignite
-        self.grid[y, x] = FIRE
-        self.fire_time[y, x] = 1
+    @fire_time.setter
+    def fire_time(self, fire_time):
+        burning = is_burning(self.state)
+        self.state[burning] = np.clip(np.asarray(fire_time)[burning], 1, BURN_DURATION)
+
+    @property
+    def burning(self):
+        return is_burning(self.state)
 
     def step(self):
-        new_grid = self.grid.copy()
-        new_fire_time = self.fire_time.copy()
+        """Advance the fire by one step; returns the flat indices of the cells that caught fire."""
+        if not instrumentation.enabled:
+            return self.ENGINES[self.engine](self)
+
+        # Per-step counters take a few whole-grid passes, so they're only kept with metrics on
+        burnouts = int(np.count_nonzero(self.state == BURN_DURATION))
+        start = time.perf_counter()
+        ignited = self.ENGINES[self.engine](self)
+        seconds = time.perf_counter() - start
+        burning = int(np.count_nonzero(self.burning))
+        ignitions = len(ignited)
+
+        instrumentation.observe("fire_step_seconds", seconds, start=start, engine=self.engine,
+                                args=dict(burning=burning, ignitions=ignitions, burnouts=burnouts))
+        instrumentation.count("fire_ignitions_total", ignitions)
+        instrumentation.count("fire_burnouts_total", burnouts)
+        instrumentation.gauge("fire_burning_cells", burning)
+        return ignited
 
-        fire_yx = np.argwhere(self.grid == FIRE)
+    def _step_loop(self):
+        new_state = self.state.copy()
+
+        fire_yx = np.argwhere(self.burning)
         for y, x in fire_yx:
             # Burned out?
-            if self.fire_time[y, x] >= BURN_DURATION:
-                new_grid[y, x] = 0  # Becomes EMPTY
-                new_fire_time[y, x] = 0
+            if self.state[y, x] >= BURN_DURATION:
+                new_state[y, x] = BURNT  # Becomes EMPTY
                 continue
 
-            new_fire_time[y, x] += 1
-
-            for dy in [-1, 0, 1]:
-                for dx in [-1, 0, 1]:
-                    if dy == 0 and dx == 0:
-                        continue
-                    ny, nx = y + dy, x + dx
-                    if 0 <= ny < self.grid.shape[0] and 0 <= nx < self.grid.shape[1]:
-                        target = self.grid[ny, nx]
-
-                        # Spread fire to trees
-                        if target == TREE and np.random.random() < TREE_SPREAD_PROB:
-                            new_grid[ny, nx] = FIRE
-                            new_fire_time[ny, nx] = 1
-                        # Spread fire to non-tree areas based on population density
-                        elif target != FIRE and target != TREE:
-                            # Calculate spread probability based on population density
-                            population_density = self.grid[ny, nx]
-                            if population_density == 0:
-                                prob = EMPTY_SPREAD_PROB  # Regular empty land
-                            else:
-                                # Slightly increase spread probability based on population density
-                                prob = EMPTY_SPREAD_PROB * (1 + population_density * SPREAD_DENSITY_SCALE)
-
-                            if np.random.random() < prob:
-                                new_grid[ny, nx] = FIRE
-                                new_fire_time[ny, nx] = 1
-
-        self.grid = new_grid
-        self.fire_time = new_fire_time
+            new_state[y, x] += 1
+
+            for direction, (dy, dx) in enumerate(NEIGHBOR_OFFSETS):
+                ny, nx = y + dy, x + dx
+                if 0 <= ny < self.state.shape[0] and 0 <= nx < self.state.shape[1]:
+                    neighbor = self.state[ny, nx]
+                    if neighbor != 0 and neighbor != BURNT:
+                        continue  # Already on FIRE
+                    target = 0 if neighbor == BURNT else int(self.terrain[ny, nx])
+
+                    # Spread fire to trees and to non-tree areas based on population density,
+                    # scaled for wind and slope along this direction (see spread_table)
+                    if self.rng.random() < self._spread_table[target + 1, direction]:
+                        new_state[ny, nx] = 1
+
+        self.state = new_state
+        return np.flatnonzero(new_state == 1)  # Cells still burning are 2 or more by now
+
+    def _step_vectorized(self):
+        return advance_fire(self.terrain, self.state, self._ignition_table, self.rng)
+
+    def _step_sparse(self):
+        # The burning set is carried over between steps, so cells set on FIRE by hand after
+        # the first step are not picked up
+        if self._active is None:
+            self._active = np.flatnonzero(self.burning)
+        self._active = advance_fire_sparse(self.terrain, self.state, self._active, self._ignition_table, self.rng)
+        return self._active[self.state.ravel()[self._active] == 1]
+
+    ENGINES = {"loop": _step_loop, "vectorized": _step_vectorized, "sparse": _step_sparse}
 
     def visualize(self, step, imshow_obj):
-        # Prepare grid for display
-        display_grid = self.grid.copy()
+        # Prepare grid for display (grid is already a fresh array)
+        display_grid = self.grid
         display_grid[display_grid == TREE] = -1
         display_grid[display_grid == FIRE] = 10  # Just a high value to make it visibly distinct
 
@@ -90,6 +322,312 @@ class FireGrid:
     def get_final_grid(self):
         return self.grid
 
+    def snapshot(self):
+        """The fire as it is now (see FireSnapshot), to restore() this grid or fork() new ones from later."""
+        active = None if self._active is None else self._active.copy()
+        return FireSnapshot(self.state, copy.deepcopy(self.rng.bit_generator.state), active)
+
+    def restore(self, snapshot):
+        """Put the fire back to a snapshot of this grid (or of one sharing its terrain); the random stream resumes too."""
+        if snapshot.shape != self.state.shape:
+            raise ValueError(f"Snapshot of a {snapshot.shape} grid can't be restored onto a {self.state.shape} grid.")
+        self.state = snapshot.to_state()
+        self.rng.bit_generator.state = copy.deepcopy(snapshot.rng_state)
+        self._active = None if snapshot.active is None else snapshot.active.copy()
+
+    def fork(self, seed=None, snapshot=None):
+        """
+        A new FireGrid continuing this fire from now (or from `snapshot`), for what-if branches.
+        - The read-only terrain and the spread tables are shared, so a fork only adds its own
+          state byte per cell; interventions (setting `grid` on the fork) give the fork a new
+          terrain and leave the parent's alone.
+        - Without a seed the fork replays the parent's random stream exactly; with one (an int,
+          SeedSequence or Generator) each branch gets its own future.
+        """
+        child = copy.copy(self)
+        child.rng = copy.deepcopy(self.rng) if seed is None else np.random.default_rng(seed)
+        if snapshot is None:
+            child.state = self.state.copy()
+            child._active = None if self._active is None else self._active.copy()
+        else:
+            child.restore(snapshot)
+            if seed is not None:
+                child.rng = np.random.default_rng(seed)  # restore() brought back the snapshot's stream
+        return child
+
+class FireSnapshot:
+    """
+    State of a FireGrid at one step, stored as a delta from an unburnt map: the flat indices and
+    values of its burning and burned-out cells, plus the generator state and the sparse engine's
+    burning set. Early in a fire that is a small fraction of the one-byte-per-cell state.
+    """
+
+    def __init__(self, state, rng_state, active=None):
+        self.shape = state.shape
+        self.cells = np.flatnonzero(state).astype(np.int32 if state.size < 2**31 else np.int64)
+        self.values = state.ravel()[self.cells]
+        self.rng_state = rng_state
+        self.active = active
+
+    @property
+    def nbytes(self):
+        return self.cells.nbytes + self.values.nbytes + (0 if self.active is None else self.active.nbytes)
+
+    def to_state(self):
+        state = np.zeros(self.shape, dtype=np.uint8)
+        state.ravel()[self.cells] = self.values
+        return state
+
+def popcount(words):
+    """Number of set bits in each element of an unsigned integer array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    as_bytes = np.ascontiguousarray(words).view(np.uint8).reshape(words.shape + (-1,))
+    return np.unpackbits(as_bytes, axis=-1).sum(axis=-1, dtype=np.uint8)
+
+def count_planes(masks):
+    """Bit-sliced count of the uint64 `masks` setting each lane: planes[k] holds bit k of every lane's count."""
+    planes = []
+    for added, mask in enumerate(masks, 1):
+        carry = mask
+        for k, plane in enumerate(planes):
+            planes[k], carry = plane ^ carry, plane & carry
+        if len(planes) < added.bit_length():  # The count just gained a bit
+            planes.append(carry)
+    return planes
+
+def highest_count(planes, lanes):
+    """Largest count in each word of count_planes over the lanes set in `lanes`."""
+    most = np.zeros(len(planes[0]), dtype=np.intp)
+    for k in range(len(planes) - 1, -1, -1):
+        # Keep to the lanes with bit k set, when there are any
+        top = lanes & planes[k]
+        has = top != 0
+        most += has << k
+        lanes = np.where(has, top, lanes)
+    return most
+
+def lane_count(planes, bits):
+    """Count of the lane marked by the one-bit word `bits` in each word of count_planes."""
+    return sum(((plane & bits) != 0).astype(np.intp) << k for k, plane in enumerate(planes))
+
+# BYTE_SELECT[b, k] is the position of the (k + 1)-th set bit of the byte b
+BYTE_SELECT = np.argsort(~np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little").astype(bool),
+                         axis=1, kind="stable").astype(np.uint8)
+
+def select_bit(words, rank):
+    """The (rank + 1)-th lowest set bit of each uint64 word, as a one-bit word."""
+    # Byte-wise popcounts, then their running sums in each byte by one multiplication
+    counts = words - ((words >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    counts = (counts & np.uint64(0x3333333333333333)) + ((counts >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    counts = (counts + (counts >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    running = counts * np.uint64(0x0101010101010101)
+    # The bytes whose running sum is at most rank come before the bit: the high bit of each byte
+    # of (rank + 128) - running is set when it is (no byte borrows, as running sums are <= 64)
+    spread_rank = (rank.astype(np.uint64) * np.uint64(0x0101010101010101)) | np.uint64(0x8080808080808080)
+    shift = np.uint64(8) * popcount((spread_rank - running) & np.uint64(0x8080808080808080)).astype(np.uint64)
+    below = ((running << np.uint64(8)) >> shift) & np.uint64(0xFF)
+    bit = BYTE_SELECT[(words >> shift) & np.uint64(0xFF), rank - below.astype(np.intp)] + shift
+    return np.left_shift(np.uint64(1), bit)
+
+def bernoulli_draws(log_miss, rng, lanes):
+    """(word, bit) of the set bits of `lanes` (uint64 words) that hit, each independently with
+    probability 1 - exp(log_miss) of its word; bit is a one-bit word."""
+    # Rather than a draw per bit, walk each word's set bits by geometric gaps (the misses before
+    # the next hit, an exponential variate over -log_miss rounded down). A word first gets one
+    # gap, as most never hit; the ones that do get about as many more as they have hits left,
+    # all drawn together, until their gaps run off the end
+    remaining = popcount(lanes).astype(np.intp)
+    word = np.flatnonzero((remaining > 0) & (log_miss < 0))
+    log_miss, remaining = log_miss[word], remaining[word]
+    gap = rng.standard_exponential(len(word)) / -log_miss
+    more = np.flatnonzero(gap < remaining)
+    word, log_miss, remaining = word[more], log_miss[more], remaining[more]
+    words, ranks = [word], [gap[more].astype(np.intp)]
+    passed = ranks[0] + 1
+    while len(word):
+        expected = (remaining - passed) * -np.expm1(log_miss)
+        draws = (expected + 2 * np.sqrt(expected)).astype(np.intp) + 1
+        owner = np.repeat(np.arange(len(word)), draws)
+        gap = rng.standard_exponential(len(owner)) / -log_miss[owner]
+        position = np.cumsum(np.minimum(gap, MEMBER_BITS).astype(np.intp) + 1)
+        last = np.cumsum(draws) - 1
+        # Rank of the set bit each draw lands on, from where its word's draws start
+        rank = position + np.repeat(passed - np.concatenate([[0], position[last[:-1]]]), draws) - 1
+        hit = np.flatnonzero(rank < remaining[owner])
+        words.append(word[owner[hit]])
+        ranks.append(rank[hit])
+        more = np.flatnonzero(rank[last] < remaining)
+        word, log_miss, remaining, passed = word[more], log_miss[more], remaining[more], rank[last][more] + 1
+    word = np.concatenate(words)
+    return word, select_bit(lanes[word], np.concatenate(ranks))
+
+class FireEnsemble:
+    """K independent runs of the same fire, advanced together over one shared terrain."""
+    # Members are bit-packed, MEMBER_BITS to a uint64 word per cell: each state (unburnt, burned
+    # out, burning for k steps) is a bit plane, so one whole-array operation moves 64 members.
+    # Neighbor counts are bit-sliced too (count_planes), and the spread draws skip from hit to
+    # hit over a word's members (bernoulli_draws), so a step costs about one draw per cell next
+    # to a spreading fire plus one per ignition, whatever the number of members in the word.
+    # Burn timers are a ring of planes, so ageing every fire is moving its head, and a step only
+    # covers the box around the cells burning in any member. A member adds about 1.5 bits per
+    # cell instead of a state byte.
+
+    def __init__(self, forest_city_matrix, members, fire_time=None, seed=None,
+                 wind_direction=0.0, wind_speed=0.0, slope=0.0, slope_direction=0.0):
+        self.rng = np.random.default_rng(seed)
+        self.members = members
+        self.terrain, state = encode_grid(forest_city_matrix, fire_time)
+        state = np.repeat(state[None], members, axis=0)
+
+        if fire_time is None:
+            # Every member starts from its own randomly chosen tree
+            ignite_random_tree(self.terrain, state, self.rng)
+
+        self.spread_conditions, self._spread_table, _ = spread_tables(
+            self.terrain, wind_direction=wind_direction, wind_speed=wind_speed, slope=slope, slope_direction=slope_direction)
+        # Directions with the same wind and slope multiplier share their spread probabilities, so
+        # a member's tries into a cell only depend on how many of each group spread into it (all
+        # 8 directions are one group on a calm, flat map); n tries at p miss with (1 - p)^n
+        multipliers = direction_multipliers(**self.spread_conditions)
+        self._direction_groups = [np.flatnonzero(multipliers == multiplier) for multiplier in np.unique(multipliers)]
+        self._log_miss = np.log1p(-np.minimum(self._spread_table, 1 - 1e-12))[:, [group[0] for group in self._direction_groups]]
+
+        self._words = -(-members // MEMBER_BITS)
+        self._unburnt = self.pack(state == 0)
+        self._burnt = self.pack(state == BURNT)
+        # Ring of BURN_DURATION planes: _timers[(_head + k) % BURN_DURATION] holds the members
+        # burning for k + 1 steps, as in Fire_probability
+        self._timers = np.stack([self.pack(state == k) for k in range(1, BURN_DURATION + 1)])
+        self._head = 0
+        self.burning_bits = self.pack(is_burning(state))
+        self._box = self._burning_box(self.burning_bits, 0, 0)
+
+    @classmethod
+    def from_fire_grid(cls, fire_grid, members, seed=None):
+        """Branch `members` copies off the current state of a FireGrid (same wind and slope)."""
+        return cls(fire_grid.grid, members, fire_time=fire_grid.fire_time, seed=seed, **fire_grid.spread_conditions)
+
+    def pack(self, members):
+        """(words, H, W) uint64 bit planes of a (K, H, W) boolean array; member m is bit m % 64 of word m // 64."""
+        lanes = np.zeros((members[0].size, self._words * MEMBER_BITS), dtype=bool)
+        lanes[:, :self.members] = members.reshape(self.members, -1).T
+        words = np.packbits(lanes, axis=-1, bitorder="little").view("<u8").astype(np.uint64)
+        return np.ascontiguousarray(words.T).reshape((self._words,) + members.shape[1:])
+
+    def unpack(self, bits):
+        """(K, H, W) boolean array of (words, H, W) bit planes, the inverse of pack."""
+        words = np.ascontiguousarray(bits.reshape(self._words, -1).T, dtype="<u8")
+        lanes = np.unpackbits(words.view(np.uint8), axis=-1, count=self.members, bitorder="little")
+        return np.ascontiguousarray(lanes.T).reshape((self.members,) + bits.shape[1:]).astype(bool)
+
+    def count(self, bits):
+        """Number of members whose bit is set, per cell, for (words, H, W) bit planes."""
+        return popcount(bits).sum(axis=0, dtype=np.int32)
+
+    def burn_time_counts(self):
+        """Number of members burning for 1..BURN_DURATION steps, per cell, as a (BURN_DURATION, H, W) array."""
+        return np.stack([self.count(self._timer_plane(burn_time)) for burn_time in range(1, BURN_DURATION + 1)])
+
+    def _timer_plane(self, burn_time):
+        return self._timers[(self._head + burn_time - 1) % BURN_DURATION]
+
+    @property
+    def state(self):
+        """Per-member states in FireGrid's compact layout, (K, H, W) uint8."""
+        state = np.zeros((self.members,) + self.terrain.shape, dtype=np.uint8)
+        state[self.unpack(self._burnt)] = BURNT
+        for burn_time in range(1, BURN_DURATION + 1):
+            state[self.unpack(self._timer_plane(burn_time))] = burn_time
+        return state
+
+    @property
+    def grid(self):
+        return decode_grid(self.terrain, self.state)
+
+    @property
+    def fire_time(self):
+        return decode_fire_time(self.state)
+
+    @property
+    def burning(self):
+        return self.unpack(self.burning_bits)
+
+    def _burning_box(self, burning, top, left):
+        """(rows, cols) slices around the burning cells of a block at top, left, grown by one cell; None if none burn."""
+        burning = burning.any(axis=0)
+        rows = np.flatnonzero(burning.any(axis=1))
+        if len(rows) == 0:
+            return None
+        cols = np.flatnonzero(burning.any(axis=0))
+        height, width = self.terrain.shape
+        return (slice(max(top + rows[0] - 1, 0), min(top + rows[-1] + 2, height)),
+                slice(max(left + cols[0] - 1, 0), min(left + cols[-1] + 2, width)))
+
+    def step(self):
+        """Advance all members by one step; returns the (words, H, W) bit planes of the members whose cell ignited."""
+        ignited = np.zeros_like(self.burning_bits)
+        if self._box is None:
+            return ignited  # Every fire is out
+        # Nothing outside the box burns or can catch fire this step
+        rows, cols = self._box
+        box = (slice(None), rows, cols)
+        h, w = rows.stop - rows.start, cols.stop - cols.start
+        burning_out = self._timer_plane(BURN_DURATION)[box]
+        unburnt, burnt = self._unburnt[box], self._burnt[box]
+        spreading = np.zeros((self._words, h + 2, w + 2), dtype=np.uint64)
+        np.bitwise_and(self.burning_bits[box], ~burning_out, out=spreading[:, 1:-1, 1:-1])
+
+        # Cells where some member is unburnt or burned out next to a spreading fire
+        reach = np.zeros((self._words, h, w), dtype=np.uint64)
+        for dy, dx in NEIGHBOR_OFFSETS:
+            reach |= spreading[:, 1 - dy:1 - dy + h, 1 - dx:1 - dx + w]
+        candidates = np.flatnonzero((reach & (unburnt | burnt)) != 0)
+        word, cell = np.divmod(candidates, h * w)
+        y, x = np.divmod(cell, w)
+        center = (word * (h + 2) + y + 1) * (w + 2) + x + 1
+
+        # The members each direction spreads into the candidates from, counted per direction group
+        spreading_in = spreading.ravel()[center - (NEIGHBOR_DY * (w + 2) + NEIGHBOR_DX)[:, None]]
+        counts = [count_planes(spreading_in[group]) for group in self._direction_groups]
+        spread_into = np.bitwise_or.reduce(spreading_in, axis=0)
+        lanes = np.concatenate([unburnt.ravel()[candidates], burnt.ravel()[candidates]]) & np.tile(spread_into, 2)
+
+        # One lane of unburnt members per candidate, trying at the cell's spread probabilities,
+        # and one of burned-out members, trying at EMPTY's (see spread_table). The draws are made
+        # at the highest probability in the word, with every group at its most members' count,
+        # and each hit is then kept with the member's own probability over that one
+        levels = self.terrain.ravel()[(rows.start + y) * self.terrain.shape[1] + cols.start + x].astype(np.intp) + 1
+        levels = np.concatenate([levels, np.ones(len(cell), dtype=np.intp)])
+        most = np.stack([np.concatenate([highest_count(planes, half) for half in lanes.reshape(2, -1)]) for planes in counts], axis=1)
+        bound = (most * self._log_miss[levels]).sum(axis=1)
+        lane, bit = bernoulli_draws(bound, self.rng, lanes)
+        tried = lane % len(cell)
+        member = np.stack([lane_count(planes, bit) for planes in (
+            [plane[tried] for plane in group_planes] for group_planes in counts)], axis=1)
+        log_miss = (member * self._log_miss[levels[lane]]).sum(axis=1)
+        kept = np.flatnonzero(self.rng.random(len(lane)) * -np.expm1(bound[lane]) < -np.expm1(log_miss))
+
+        # A member's cell ignites when its try hits. Every kept bit of a cell is a different
+        # member, so ORing them is adding them, done exactly in floats 32 bits at a time
+        tried, bit = tried.take(kept), bit.take(kept)
+        low = np.bincount(tried, weights=bit & np.uint64(0xFFFFFFFF), minlength=len(cell))
+        high = np.bincount(tried, weights=bit >> np.uint64(32), minlength=len(cell))
+        ignites = (high.astype(np.uint64) << np.uint64(32)) | low.astype(np.uint64)
+        block = np.zeros(self._words * h * w, dtype=np.uint64)
+        block[candidates] = ignites
+        block = block.reshape(self._words, h, w)
+        ignited[box] = block
+
+        self._burnt[box] = (self._burnt[box] | burning_out) & ~block
+        self._unburnt[box] &= ~block
+        self.burning_bits[box] = (self.burning_bits[box] & ~burning_out) | block
+        # The plane that burned out is reused for the new fires, which are now 1 step old
+        self._head = (self._head - 1) % BURN_DURATION
+        self._timers[self._head][box] = block
+        self._box = self._burning_box(self.burning_bits[box], rows.start, cols.start)
+        return ignited
+
 # EXAMPLE USAGE
 if __name__ == '__main__':
     from Forest import generate_clumpy_forest, TREE as TREE_MARKER
@@ -0,0 +1,174 @@
+import os
+import numpy as np
+from Fire_simulation import (TREE, FIRE, advance_fire, is_burning, decode_grid, decode_fire_time,
+                             encode_grid, spread_tables)
+
+DEFAULT_TILE_SIZE = 512
+TERRAIN_FILE = "terrain.npy"
+STATE_FILE = "state.npy"
+
+def write_terrain(directory, forest_city_matrix, tile_size=DEFAULT_TILE_SIZE):
+    """Write an in-memory forest/city matrix to `directory` as the terrain file of a TiledFireGrid."""
+    matrix = np.asarray(forest_city_matrix)
+    return write_terrain_tiles(directory, matrix.shape, (
+        ((y, x), matrix[y:y + tile_size, x:x + tile_size])
+        for y in range(0, matrix.shape[0], tile_size)
+        for x in range(0, matrix.shape[1], tile_size)
+    ))
+
+def write_terrain_tiles(directory, shape, tiles):
+    """
+    Write the terrain file of a TiledFireGrid from ((y, x), block) pairs without ever holding the
+    whole map: blocks hold TREE or a population density (the layout of the forest/city matrices).
+    """
+    os.makedirs(directory, exist_ok=True)
+    terrain = np.lib.format.open_memmap(os.path.join(directory, TERRAIN_FILE), mode="w+", dtype=np.int8, shape=shape)
+    for (y, x), block in tiles:
+        block_terrain, _ = encode_grid(block)
+        terrain[y:y + block.shape[0], x:x + block.shape[1]] = block_terrain
+    terrain.flush()
+    return os.path.join(directory, TERRAIN_FILE)
+
+class TiledFireGrid:
+    """
+    FireGrid over memory-mapped terrain and state files, for maps that don't fit in RAM.
+    - Same spread rules as FireGrid.step (vectorized engine), including wind and slope.
+    - The map is cut into tiles; only tiles holding fire, plus the neighbors the fire can reach
+      this step, are read into memory, each with a one-cell halo from the tiles around it.
+    - The state file uses the compact FireGrid layout (see Fire_simulation.encode_grid).
+    """
+
+    def __init__(self, directory, tile_size=DEFAULT_TILE_SIZE, seed=None, ignition=None, resume=False,
+                 wind_direction=0.0, wind_speed=0.0, slope=0.0, slope_direction=0.0):
+        self.directory = directory
+        self.tile_size = tile_size
+        self.rng = np.random.default_rng(seed)
+        self.terrain = np.load(os.path.join(directory, TERRAIN_FILE), mmap_mode="r")
+        self.shape = self.terrain.shape
+        self.tiles = (-(-self.shape[0] // tile_size), -(-self.shape[1] // tile_size))
+
+        state_path = os.path.join(directory, STATE_FILE)
+        if resume:
+            self.state = np.load(state_path, mmap_mode="r+")
+        else:
+            self.state = np.lib.format.open_memmap(state_path, mode="w+", dtype=np.uint8, shape=self.shape)
+
+        # One pass over the terrain for the table size and, if needed, a random tree to ignite
+        max_level = 0
+        tree_counts = {}
+        for tile in self._all_tiles():
+            block = self.terrain[self._bounds(tile)]
+            max_level = max(max_level, int(block.max()))
+            tree_counts[tile] = int(np.count_nonzero(block == TREE))
+
+        if not resume:
+            if ignition is None:
+                ignition = self._random_tree(tree_counts)
+            self.state[ignition] = 1
+
+        self.spread_conditions, _, self._ignition_table = spread_tables(
+            self.terrain, wind_direction=wind_direction, wind_speed=wind_speed, slope=slope, slope_direction=slope_direction, max_level=max_level)
+
+        # Tiles holding burning cells, and the neighbor tiles their fire can spread into next step
+        self._active = set()
+        self._reachable = set()
+        for tile in self._all_tiles():
+            self._track(tile, self.state[self._bounds(tile)])
+
+    def _all_tiles(self):
+        return ((ty, tx) for ty in range(self.tiles[0]) for tx in range(self.tiles[1]))
+
+    def _bounds(self, tile, halo=0):
+        ty, tx = tile
+        y0, x0 = ty * self.tile_size, tx * self.tile_size
+        return (slice(max(y0 - halo, 0), min(y0 + self.tile_size + halo, self.shape[0])),
+                slice(max(x0 - halo, 0), min(x0 + self.tile_size + halo, self.shape[1])))
+
+    def _random_tree(self, tree_counts):
+        tiles = [tile for tile, count in tree_counts.items() if count]
+        if not tiles:
+            raise ValueError("No trees found in the city matrix. Ensure that your city matrix contains trees marked by the TREE constant.")
+        counts = np.array([tree_counts[tile] for tile in tiles], dtype=float)
+        tile = tiles[self.rng.choice(len(tiles), p=counts / counts.sum())]
+        rows, cols = self._bounds(tile)
+        trees = np.flatnonzero(self.terrain[rows, cols] == TREE)
+        y, x = np.unravel_index(trees[self.rng.choice(len(trees))], (rows.stop - rows.start, cols.stop - cols.start))
+        return rows.start + y, cols.start + x
+
+    def _track(self, tile, block):
+        burning = is_burning(block)
+        if not burning.any():
+            self._active.discard(tile)
+            return
+        self._active.add(tile)
+
+        # Fire on a tile edge (or corner) can cross into the tile on that side
+        ty, tx = tile
+        edges = {
+            (-1, 0): burning[0].any(), (1, 0): burning[-1].any(),
+            (0, -1): burning[:, 0].any(), (0, 1): burning[:, -1].any(),
+            (-1, -1): burning[0, 0], (-1, 1): burning[0, -1],
+            (1, -1): burning[-1, 0], (1, 1): burning[-1, -1],
+        }
+        for (dy, dx), reached in edges.items():
+            neighbor = (ty + dy, tx + dx)
+            if reached and 0 <= neighbor[0] < self.tiles[0] and 0 <= neighbor[1] < self.tiles[1]:
+                self._reachable.add(neighbor)
+
+    def step(self):
+        work = sorted(self._active | self._reachable)
+        self._reachable = set()
+
+        # Every tile is advanced from the old state before anything is written back, so tiles
+        # see their neighbors' halos exactly as FireGrid would
+        updates = []
+        for tile in work:
+            rows, cols = self._bounds(tile, halo=1)
+            inner_rows, inner_cols = self._bounds(tile)
+            state = np.array(self.state[rows, cols])
+            advance_fire(np.asarray(self.terrain[rows, cols]), state, self._ignition_table, self.rng)
+            inner = (slice(inner_rows.start - rows.start, inner_rows.stop - rows.start),
+                     slice(inner_cols.start - cols.start, inner_cols.stop - cols.start))
+            updates.append((tile, inner_rows, inner_cols, state[inner]))
+
+        for tile, rows, cols, block in updates:
+            self.state[rows, cols] = block
+            self._track(tile, block)
+
+    @property
+    def burning_tiles(self):
+        return sorted(self._active)
+
+    def window(self, rows, cols):
+        """grid and fire_time (FireGrid layout) for a slice of the map, e.g. window(slice(0, 500), slice(0, 500))."""
+        state = np.asarray(self.state[rows, cols])
+        return decode_grid(np.asarray(self.terrain[rows, cols]), state), decode_fire_time(state)
+
+    def get_final_grid(self):
+        # Decodes the whole map into memory; use window() on maps larger than RAM
+        return self.window(slice(None), slice(None))[0]
+
+    @property
+    def fire_time(self):
+        return self.window(slice(None), slice(None))[1]
+
+    def flush(self):
+        self.state.flush()
+
+# EXAMPLE USAGE
+if __name__ == "__main__":
+    import tempfile
+    from Forest import generate_clumpy_forest
+    from Forest_City import generate_large_cluster_city_matrix
+
+    rng = np.random.default_rng(0)
+    forest = generate_clumpy_forest(1000, clump_scale=35, tree_ratio=0.5, seed=rng)
+    city = generate_large_cluster_city_matrix(1000, forest, smoothness=50, distance_influence=0.2, center_bias=1.3, seed=rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_terrain(directory, city, tile_size=128)
+        fire_sim = TiledFireGrid(directory, tile_size=128, seed=rng)
+        for step in range(200):
+            fire_sim.step()
+        print("Tiles on fire:", len(fire_sim.burning_tiles))
+        print("Burning cells:", int(np.count_nonzero(fire_sim.get_final_grid() == FIRE)))
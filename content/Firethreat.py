@@ -2,58 +2,156 @@ import numpy as np
 import matplotlib.pyplot as plt
 from Forest import generate_clumpy_forest, TREE as TREE_MARKER
 from Forest_City import generate_large_cluster_city_matrix
-from Fire_simulation import FireGrid, FIRE, TREE
+from Fire_simulation import FireGrid, FireEnsemble, TREE, BURN_DURATION
+from Fire_probability import propagate_fire_probability
+import instrumentation
 import time
+import Forest
+import Forest_City
+import Fire_simulation
+import Fire_probability
+
+# Modules whose code decides a cached stage's contents (see scenario_cache); this file holds
+# generate_terrain's defaults
+TERRAIN_SOURCES = (Forest, Forest_City, __file__)
+THREAT_SOURCES = TERRAIN_SOURCES + (Fire_simulation, Fire_probability)
 
 def normalize(matrix):
     max_val = matrix.max()
     return matrix / max_val if max_val > 0 else matrix
 
-def predict_fire_threat():
-    random_seed = int(time.time())
-    np.random.seed(random_seed)
-
-    try:
-        user_steps = int(input("Enter number of initial fire steps: "))
-    except ValueError:
-        user_steps = 100
-
-    GRID_SIZE = 250
-    FUTURE_STEPS = 100
+def fire_statistics(first_burn, burning_steps, city, runs, steps, quantiles=(0.1, 0.5, 0.9)):
+    """Per-cell summary of `runs` fire runs from their first-burn steps (steps + 1 = never) and burning-step totals."""
+    never = steps + 1
+    burn_probability = (first_burn < never).sum(axis=0) / runs
+    time_to_burn = np.quantile(first_burn, quantiles, axis=0, method="inverted_cdf").astype(float)
+    time_to_burn[time_to_burn == never] = np.nan
+    return threat_statistics(burn_probability, burning_steps, dict(zip(quantiles, time_to_burn)), city, runs)
+
+def threat_statistics(burn_probability, burning_steps, time_to_burn, city, runs):
+    population = np.clip(city, 0, None)
+    return {
+        "burn_probability": burn_probability,
+        "expected_population_burned": burn_probability * population,
+        "pop_fire_danger": burning_steps * city / runs,
+        "time_to_burn": time_to_burn,
+    }
+
+def simulate_fire_ensemble(fire_sim, city, steps, members=64, quantiles=(0.1, 0.5, 0.9), seed=None):
+    """
+    Rolls `members` independent copies of fire_sim forward `steps` steps as one bit-packed
+    FireEnsemble and returns:
+    - burn_probability: share of runs in which each cell burns
+    - expected_population_burned: burn_probability weighted by population density
+    - pop_fire_danger: mean population-weighted burning steps (the single-run danger, averaged)
+    - time_to_burn: steps until each cell first burns, one map per quantile (NaN = not reached)
+    """
+    ensemble = FireEnsemble.from_fire_grid(fire_sim, members, seed=seed)
+
+    # Members that have burned by now; a quantile's time to burn is the first step at which
+    # enough of them have (the "inverted_cdf" quantile of the per-run first-burn steps)
+    burned = ensemble.burning_bits.copy()
+    burned_count = ensemble.count(burned)
+    needed = {q: max(int(np.ceil(q * members)), 1) for q in quantiles}
+    time_to_burn = {q: np.where(burned_count >= needed[q], 0.0, np.nan) for q in quantiles}
+
+    # Burning steps come from the ignitions alone: a fire burning for `timer` steps at the start
+    # burns BURN_DURATION - timer more, one lit at step s burns BURN_DURATION (within `steps`)
+    remaining = np.minimum(BURN_DURATION - np.arange(1, BURN_DURATION + 1), steps)
+    burning_steps = np.tensordot(remaining, ensemble.burn_time_counts(), axes=1)
+
+    for step in range(1, steps + 1):
+        ignited = ensemble.step()
+        burning_steps += ensemble.count(ignited) * min(BURN_DURATION, steps - step + 1)
+        burned |= ignited
+        burned_count = ensemble.count(burned)
+        for q, times in time_to_burn.items():
+            times[np.isnan(times) & (burned_count >= needed[q])] = step
+
+    return threat_statistics(burned_count / members, burning_steps, time_to_burn, city, members)
+
+GRID_SIZE = 250
+FUTURE_STEPS = 100
+DEFAULT_INITIAL_STEPS = 100
+
+def generate_terrain(grid_size, rng, clump_scale=35, tree_ratio=0.5, smoothness=50, distance_influence=0.2, center_bias=1.3):
+    """(forest, city) of the pipeline's scenario."""
+    forest = generate_clumpy_forest(grid_size, clump_scale=clump_scale, tree_ratio=tree_ratio, seed=rng)
+    city = generate_large_cluster_city_matrix(grid_size, forest, smoothness=smoothness, distance_influence=distance_influence,
+                                              center_bias=center_bias, seed=rng)
+    return forest, city
+
+def compute_fire_threat(initial_steps=DEFAULT_INITIAL_STEPS, grid_size=GRID_SIZE, future_steps=FUTURE_STEPS,
+                        ensemble_size=None, seed=None, on_step=None, cache=None, mean_field=False, terrain_params=None,
+                        **spread_conditions):
+    """
+    Forest -> city -> fire -> danger map with no prompts or windows (see predict_fire_threat).
+    on_step(step, fire_sim), if given, runs before each of the `initial_steps` fire steps.
+    terrain_params overrides generate_terrain's keyword defaults (clump_scale, tree_ratio, ...).
+    The forecast is one rollout, an ensemble of `ensemble_size` runs, or with mean_field the
+    expected danger from Fire_probability in a single deterministic pass.
+    With a scenario_cache.ScenarioCache the terrain and the threat maps are loaded when this
+    scenario was computed before (on_step is then not called for a cached fire).
+    Returns (scaled_danger, fire_time, city, forest).
+    """
+    # Terrain and fire each get a generator spawned from `seed` (or the clock), so a cached
+    # terrain leaves the fire's random numbers exactly as they would have been
+    random_seed = int(time.time()) if seed is None else seed
+    terrain_seed, fire_seed = np.random.SeedSequence(random_seed).spawn(2)
+    terrain_params = dict(terrain_params or {})
 
     # Generate environment with random seed
-    forest = generate_clumpy_forest(GRID_SIZE, clump_scale=35, tree_ratio=0.5, seed=random_seed)
-    city = generate_large_cluster_city_matrix(GRID_SIZE, forest, smoothness=50, distance_influence=0.2, center_bias=1.3)
+    with instrumentation.timer("pipeline_stage", stage="terrain"):
+        if cache is None:
+            forest, city = generate_terrain(grid_size, np.random.default_rng(terrain_seed), **terrain_params)
+        else:
+            terrain = cache.cached("terrain", {"grid_size": grid_size, "seed": random_seed, **terrain_params},
+                                   lambda: dict(zip(("forest", "city"), generate_terrain(
+                                       grid_size, np.random.default_rng(terrain_seed), **terrain_params))),
+                                   sources=TERRAIN_SOURCES)
+            forest, city = terrain["forest"].astype(int), terrain["city"].astype(int)
+
+    if cache is None:
+        return _threat_from_terrain(forest, city, initial_steps, future_steps, ensemble_size, mean_field, fire_seed, on_step, spread_conditions)
+
+    params = {"grid_size": grid_size, "seed": random_seed, "terrain": terrain_params, "initial_steps": initial_steps, "future_steps": future_steps,
+              "ensemble_size": ensemble_size or 0, "mean_field": bool(mean_field), **spread_conditions}
+    threat = cache.cached("threat", params, lambda: dict(zip(("danger", "fire_time"), _threat_from_terrain(
+        forest, city, initial_steps, future_steps, ensemble_size, mean_field, fire_seed, on_step, spread_conditions)[:2])), sources=THREAT_SOURCES)
+    return threat["danger"].astype(int), threat["fire_time"].astype(np.uint8), city, forest
+
+def _threat_from_terrain(forest, city, initial_steps, future_steps, ensemble_size, mean_field, fire_seed, on_step, spread_conditions):
+    rng = np.random.default_rng(fire_seed)
     city_with_forest = city.copy()
     city_with_forest[forest == 1] = TREE
 
-    fire_sim = FireGrid(city_with_forest)
-
-    # Create figure for animation
-    fig, ax = plt.subplots(figsize=(6, 6))  # Create a 6x6 inch figure
-    imshow_obj = ax.imshow(fire_sim.grid, cmap="hot", vmin=-1, vmax=10)  # Display the grid, color-mapped with 'hot' colormap
-    ax.axis('off')  # Turn off the axis for the visualization
-
-    # Animation loop to simulate fire spread for a number of steps
-    for step in range(user_steps):
-        fire_sim.visualize(step, imshow_obj)  # Update the visualization to reflect the current fire grid
-        fire_sim.step()  # Advance the fire simulation by one time step
-        plt.title(f"Fire Spread Step {step}")  # Update the title of the plot to reflect the current step
-        plt.pause(0.01)  # Pause to display the updated plot for a brief moment (this controls animation speed)
+    fire_sim = FireGrid(city_with_forest, seed=rng, **spread_conditions)  # Optional wind_direction, wind_speed, slope, slope_direction
 
-    plt.close(fig)  # 👈 Closes the fire animation window after it's done
+    with instrumentation.timer("pipeline_stage", stage="initial_fire"):
+        for step in range(initial_steps):
+            if on_step is not None:
+                on_step(step, fire_sim)
+            fire_sim.step()  # Advance the fire simulation by one time step
 
     # 🔥 Compute population-weighted future fire danger
-    pop_fire_danger = np.zeros_like(fire_sim.grid, dtype=float)
-    burn_frequency = np.zeros_like(fire_sim.grid, dtype=float)
-
-    for _ in range(FUTURE_STEPS):
-        fire_sim.step()
-        burning_now = (fire_sim.grid == FIRE)
-        
-        # Add population-weighted burning to danger
-        pop_fire_danger += burning_now * city
-        burn_frequency += burning_now.astype(float)
+    with instrumentation.timer("pipeline_stage", stage="fire_forecast"):
+        if mean_field:
+            # Expected danger in one pass, no sampling
+            pop_fire_danger = propagate_fire_probability(fire_sim, city, future_steps)["pop_fire_danger"]
+        elif ensemble_size:
+            # Average over many futures instead of trusting a single rollout
+            pop_fire_danger = simulate_fire_ensemble(fire_sim, city, future_steps, members=ensemble_size, seed=rng)["pop_fire_danger"]
+        else:
+            pop_fire_danger = np.zeros(fire_sim.state.shape)
+            burn_frequency = np.zeros(fire_sim.state.shape)
+
+            for _ in range(future_steps):
+                fire_sim.step()
+                burning_now = fire_sim.burning
+
+                # Add population-weighted burning to danger
+                pop_fire_danger += burning_now * city
+                burn_frequency += burning_now.astype(float)
 
     # Normalize all components
     fire_component = normalize(pop_fire_danger)         # 🔥 Most important
@@ -71,15 +169,49 @@ def predict_fire_threat():
     normalized_total_danger = normalize(total_danger)
     scaled_danger = np.round(normalized_total_danger * 9).clip(0, 9).astype(int)
 
-    # Final display
-    plt.figure(figsize=(6, 6))
+    return scaled_danger, fire_sim.fire_time, city, forest
+
+def plot_danger_map(scaled_danger, future_steps=FUTURE_STEPS, path=None):
+    """Show the danger map, or save it to `path` without opening a window."""
+    fig = plt.figure(figsize=(6, 6))
     plt.imshow(scaled_danger, cmap="inferno", interpolation="nearest")
-    plt.title("Predicted Fire Danger Map (Next 100 Steps)")
+    plt.title(f"Predicted Fire Danger Map (Next {future_steps} Steps)")
     plt.axis("off")
     plt.colorbar(label="Danger Level (0–9)")
-    plt.show()
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path, bbox_inches="tight")
+        plt.close(fig)
+
+def predict_fire_threat(ensemble_size=None, seed=None, cache=None, mean_field=False, **spread_conditions):
+    # Interactive version of compute_fire_threat: asks for the step count and animates the fire
+    try:
+        user_steps = int(input("Enter number of initial fire steps: "))
+    except ValueError:
+        user_steps = DEFAULT_INITIAL_STEPS
 
-    return scaled_danger, fire_sim.fire_time, city, forest
+    # Create figure for animation
+    fig, ax = plt.subplots(figsize=(6, 6))  # Create a 6x6 inch figure
+    ax.axis('off')  # Turn off the axis for the visualization
+    imshow_obj = None
+
+    def animate(step, fire_sim):
+        nonlocal imshow_obj
+        if imshow_obj is None:
+            imshow_obj = ax.imshow(fire_sim.grid, cmap="hot", vmin=-1, vmax=10)  # Display the grid, color-mapped with 'hot' colormap
+        fire_sim.visualize(step, imshow_obj)  # Update the visualization to reflect the current fire grid
+        plt.title(f"Fire Spread Step {step}")  # Update the title of the plot to reflect the current step
+        plt.pause(0.01)  # Pause to display the updated plot for a brief moment (this controls animation speed)
+
+    scaled_danger, fire_time, city, forest = compute_fire_threat(user_steps, ensemble_size=ensemble_size, seed=seed,
+                                                                 on_step=animate, cache=cache, mean_field=mean_field, **spread_conditions)
+    plt.close(fig)  # 👈 Closes the fire animation window after it's done
+
+    # Final display
+    plot_danger_map(scaled_danger)
+
+    return scaled_danger, fire_time, city, forest
 
 # Run if standalone
 if __name__ == "__main__":
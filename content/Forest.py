@@ -5,14 +5,14 @@ from scipy.ndimage import zoom
 EMPTY, TREE = 0, -1
 
 def generate_clumpy_forest(size=250, clump_scale=35, tree_ratio=0.5, seed=None):
-    if seed is not None:
-        np.random.seed(seed)
+    # seed can be an int, a SeedSequence or a Generator; the global np.random state is left alone
+    rng = np.random.default_rng(seed)
 
     # Ensure clump_scale results in an integer low_res_size
     low_res_size = max(1, int(size // clump_scale))  # Force integer by casting to int
 
     # Generate very low-res noise to create large clumps
-    noise = np.random.rand(low_res_size, low_res_size)
+    noise = rng.random((low_res_size, low_res_size))
 
     # Bicubic upscaling to smooth the clumps
     smooth_noise = zoom(noise, size / low_res_size, order=3)
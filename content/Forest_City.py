@@ -4,15 +4,16 @@ import matplotlib.pyplot as plt
 from Forest import generate_clumpy_forest
 from Forest import TREE
 
-def generate_large_cluster_city_matrix(size, forest_matrix, smoothness=10.0, distance_influence=2.0, center_bias=2.0):
+def generate_large_cluster_city_matrix(size, forest_matrix, smoothness=10.0, distance_influence=2.0, center_bias=2.0, seed=None):
     """
     Generates a city layout matrix with population density favorably distributed:
     - -1 = TREE (unbuildable)
     - 0  = buildable but unpopulated
     - 1–8 = increasing levels of population density
+    `seed` can be an int, a SeedSequence or a Generator.
     """
     # Step 1: Random noise, smoothed
-    raw_noise = np.random.rand(size, size)
+    raw_noise = np.random.default_rng(seed).random((size, size))
     smoothed = gaussian_filter(raw_noise, sigma=smoothness)
 
     # Step 2: Distance from trees
@@ -1,79 +1,159 @@
-from flask import Flask, request, jsonify
-import numpy as np
-from pyqubo import Binary
-from neal import SimulatedAnnealingSampler
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify
+import instrumentation
+from grid_qubo import best_solution, record_solve_metrics
+from checkerboard_annealer import grid_sampler
+from qubo_cache import (LRUCache, cached_grid_bqm, result_key, DEFAULT_STRUCTURE_CACHE_SIZE,
+                        DEFAULT_RESULT_CACHE_SIZE, DEFAULT_TTL)
+from qubo_jobs import JobQueue, QueueFull, FINISHED, QUEUED, RUNNING
+from qubo_batch import decode_array, stream_batch, MAX_BATCH_SIZE
 
 app = Flask(__name__)
+# /metrics always reports the cache and job gauges; request timings and solve metrics are only
+# collected with PIPELINE_METRICS=1 in the environment (python Qooked.py turns them on itself),
+# so set it when serving through flask run or a WSGI server
+
+# Model structure per (shape, alpha, beta), and finished solves per (matrix, parameters)
+structure_cache = LRUCache(DEFAULT_STRUCTURE_CACHE_SIZE, ttl=DEFAULT_TTL)
+result_cache = LRUCache(DEFAULT_RESULT_CACHE_SIZE, ttl=DEFAULT_TTL)
 
 def matrix_to_qubo(matrix, alpha=5, beta=4, allow_adjacent_penalty=True):
-    n = matrix.shape[0]
-    variables = {}
-
-    for i in range(n):
-        for j in range(n):
-            variables[(i, j)] = Binary(f"x{i}{j}")
-
-    # Objective: maximize impact
-    H = -sum(matrix[i][j] * variables[(i, j)] for i in range(n) for j in range(n))
-
-    # Penalty: fewer units (sparse deployment)
-    total_selected = sum(variables[(i, j)] for i in range(n) for j in range(n))
-    H += alpha * total_selected
-
-    # Penalty: avoid placing adjacent units
-    if allow_adjacent_penalty:
-        for i in range(n):
-            for j in range(n):
-                if i < n - 1:
-                    H += beta * variables[(i, j)] * variables[(i + 1, j)]
-                if j < n - 1:
-                    H += beta * variables[(i, j)] * variables[(i, j + 1)]
-
-    model = H.compile()
-    qubo, offset = model.to_qubo()
-    return qubo, offset, model
-
-def solve_qubo_with_neal(matrix, alpha=5, beta=4, num_reads=1000):
-    qubo, offset, model = matrix_to_qubo(matrix, alpha=alpha, beta=beta)
-    sampler = SimulatedAnnealingSampler()
-    sampleset = sampler.sample_qubo(qubo, num_reads=num_reads)
-    decoded_samples = model.decode_sampleset(sampleset)
-    best_sample = decoded_samples[0]
-
-    n = matrix.shape[0]
-    solution_matrix = np.zeros((n, n))
-
-    for i in range(n):
-        for j in range(n):
-            var_name = f"x{i}{j}"
-            solution_matrix[i, j] = best_sample.sample.get(var_name, 0)
-
-    return solution_matrix, best_sample.energy + offset
+    # Objective: maximize impact (-matrix), penalty alpha per unit (sparse deployment) and
+    # beta per pair of adjacent units; variable i * n + j is cell (i, j). Only the linear terms
+    # are filled in per call, the rest comes from structure_cache
+    return cached_grid_bqm(structure_cache, matrix, alpha, beta, allow_adjacent_penalty)
+
+def solve_qubo_with_neal(matrix, alpha=5, beta=4, num_reads=1000, backend="neal", seed=None):
+    # backend="checkerboard" anneals every read of the grid at once (see checkerboard_annealer)
+    with instrumentation.timer("qubo_compile"):
+        bqm = matrix_to_qubo(matrix, alpha=alpha, beta=beta)
+    sampler = grid_sampler(backend, matrix.shape)
+    with instrumentation.timer("qubo_sample", backend=backend):
+        sampleset = sampler.sample(bqm, num_reads=num_reads, seed=seed)
+    solution, energy = best_solution(sampleset, matrix.shape)
+    record_solve_metrics(bqm, energy, backend)
+    return solution, energy
+
+# Long solves go through /jobs, chunk by chunk on a small worker pool
+jobs = JobQueue(solve_qubo_with_neal)
+
+# Problems of one /solve_batch request are solved side by side
+batch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="qubo-batch")
+
+def parse_solve_request(data):
+    # The matrix is a list of lists or a binary array (see qubo_batch.decode_array)
+    matrix = decode_array(data["matrix"]).astype(float)
+    alpha = int(data.get("alpha", 5))
+    beta = int(data.get("beta", 4))
+    num_reads = int(data.get("num_reads", 1000))
+    backend = data.get("backend", "neal")
+    seed = None if data.get("seed") is None else int(data["seed"])
+    return matrix, alpha, beta, num_reads, backend, seed
+
+def solution_response(solution, energy):
+    return {
+        "solution": solution.astype(int).tolist(),
+        "energy": round(energy, 4),
+        "units_used": int(solution.sum())
+    }
+
+def solve_cached(matrix, alpha, beta, num_reads, backend, seed):
+    # Identical requests get the stored answer; without a seed any earlier sample of the
+    # same problem is as good as a new one
+    key = result_key(matrix, alpha, beta, num_reads, backend, seed)
+    result = result_cache.get(key)
+    if result is None:
+        result = solve_qubo_with_neal(matrix, alpha, beta, num_reads, backend, seed)
+        result_cache.put(key, result)
+    return result
+
+def solve_request(data):
+    return solve_cached(*parse_solve_request(data))
 
 @app.route("/solve_qubo", methods=["POST"])
 def solve_qubo_endpoint():
     try:
-        data = request.get_json()
-        matrix = np.array(data["matrix"])
-        alpha = int(data.get("alpha", 5))
-        beta = int(data.get("beta", 4))
-        num_reads = int(data.get("num_reads", 1000))
-        solution, energy = solve_qubo_with_neal(matrix, alpha, beta, num_reads)
-
-        return jsonify({
-            "solution": solution.astype(int).tolist(),
-            "energy": round(energy, 4),
-            "units_used": int(solution.sum())
-        })
+        return jsonify(solution_response(*solve_request(request.get_json())))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
+@app.route("/solve_batch", methods=["POST"])
+def solve_batch():
+    # {"problems": [{"id": ..., "matrix": ..., "alpha": ..., ...}, ...]}; answers stream back as
+    # NDJSON in the order they finish, with solutions as raw uint8 buffers. Each problem is
+    # parsed on its own, so a malformed one only gets an error line
+    try:
+        problems = list(request.get_json()["problems"])
+        if len(problems) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} problems per batch."}), 413
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    ids = [problem.get("id", index) if isinstance(problem, dict) else index for index, problem in enumerate(problems)]
+    return Response(stream_batch(batch_pool, solve_request, [(problem,) for problem in problems], ids),
+                    mimetype="application/x-ndjson")
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    try:
+        data = request.get_json()
+        timeout = None if data.get("timeout") is None else float(data["timeout"])
+        job = jobs.submit(*parse_solve_request(data), timeout=timeout)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 429, {"Retry-After": "5"}
     except Exception as e:
         return jsonify({"error": str(e)}), 400
+    return jsonify(job.summary()), 202, {"Location": f"/jobs/{job.id}"}
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job.summary())
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    # Finished jobs return their best solution, including cancelled or expired jobs that got
+    # through at least one chunk
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    if job.status in (QUEUED, RUNNING):
+        return jsonify(job.summary()), 202
+    if job.solution is None:
+        return jsonify(job.summary()), 409
+    return jsonify({**job.summary(), **solution_response(job.solution, job.energy)})
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job.summary()), 200 if job.status in FINISHED else 202
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    return jsonify({"structure": structure_cache.stats(), "result": result_cache.stats(), "jobs": jobs.stats()})
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    # Cache and job figures are read at scrape time, whether or not collection is on; the rest
+    # accumulates as requests run
+    gauges = [(f"qubo_cache_{field}", value, {"cache": name})
+              for name, cache in (("structure", structure_cache), ("result", result_cache))
+              for field, value in cache.stats().items() if field in ("size", "hits", "misses", "evictions")]
+    gauges += [("qubo_jobs", total, {"status": status}) for status, total in jobs.stats()["jobs"].items()]
+    return Response(instrumentation.prometheus_text(gauges), mimetype="text/plain; version=0.0.4")
 
 @app.route("/", methods=["GET"])
 def hello():
     return jsonify({"message": "QUBO Solver API is running."})
 
 if __name__ == "__main__":
+    # Serving the API collects metrics for /metrics; importers (the benchmark stages) only do
+    # with PIPELINE_METRICS set
+    instrumentation.enable()
     app.run(host='0.0.0.0', port=5000, debug=True)
 
 
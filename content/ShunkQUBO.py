@@ -1,81 +1,56 @@
 import numpy as np
-from pyqubo import Binary
-from neal import SimulatedAnnealingSampler
 from scipy.ndimage import zoom
 import matplotlib.pyplot as plt
-from Firethreat import predict_fire_threat
+from Firethreat import predict_fire_threat, compute_fire_threat
+import instrumentation
+from grid_qubo import build_grid_bqm, best_solution, record_solve_metrics
+from checkerboard_annealer import grid_sampler
+from qubo_decompose import solve_tiled
 
 # Function to resize the danger map to a 50x50 format directly
+def rescale_heatmap(danger_map):
+    """Rescales a danger map to the 0–9 range, keeping its shape."""
+    min_val, max_val = danger_map.min(), danger_map.max()
+    if max_val > min_val:
+        return (danger_map - min_val) / (max_val - min_val) * 9
+    return np.zeros_like(danger_map, dtype=float)
+
 def resize_heatmap(original_map, target_size=50):
     """Resizes and rescales the original danger map to target size using interpolation."""
     h, w = original_map.shape
     resized_map = zoom(original_map, (target_size / h, target_size / w), order=1)  # Bilinear interpolation
 
     # Normalize to 0–9 range
-    min_val, max_val = resized_map.min(), resized_map.max()
-    if max_val > min_val:
-        resized_map = (resized_map - min_val) / (max_val - min_val) * 9
-    else:
-        resized_map = np.zeros_like(resized_map)
-
-    return resized_map
+    return rescale_heatmap(resized_map)
 
 # QUBO conversion function
 def matrix_to_qubo(matrix, alpha=2, beta=4, allow_adjacent_penalty=True):
-    n = matrix.shape[0]
-    variables = {}
-
-    for i in range(n):
-        for j in range(n):
-            variables[(i, j)] = Binary(f"x{i}{j}")
-
-    # Objective: maximize matrix values (minimize negative weighted sum)
-    H = -sum(matrix[i][j] * variables[(i, j)] for i in range(n) for j in range(n))
-
-    # Penalty for number of units used
-    total_selected = sum(variables[(i, j)] for i in range(n) for j in range(n))
-    H += float(alpha).__float__() * total_selected
-
-    # Penalty for adjacent units selected together
-    if allow_adjacent_penalty:
-        for i in range(n):
-            for j in range(n):
-                if i < n - 1:
-                    H += float(beta).__float__() * variables[(i, j)] * variables[(i + 1, j)]
-                if j < n - 1:
-                    H += float(beta).__float__() * variables[(i, j)] * variables[(i, j + 1)]
-
-    model = H.compile()
-    qubo, offset = model.to_qubo()
-    return qubo, offset, model
-
-# Solving the QUBO with the Simulated Annealing Sampler
-def solve_qubo_with_neal(matrix, alpha=2, beta=4, num_reads=100):
-    qubo, offset, model = matrix_to_qubo(matrix, alpha=alpha, beta=beta)
-    sampler = SimulatedAnnealingSampler()
-    sampleset = sampler.sample_qubo(qubo, num_reads=num_reads)
-    decoded_samples = model.decode_sampleset(sampleset)
-    best_sample = decoded_samples[0]
-
-    n = matrix.shape[0]
-    solution_matrix = np.zeros((n, n))
-    for i in range(n):
-        for j in range(n):
-            varname = f"x{i}{j}"
-            solution_matrix[i, j] = best_sample.sample.get(varname, 0)
-
-    return solution_matrix, best_sample.energy + offset
+    # Objective: maximize matrix values (minimize negative weighted sum), plus alpha per unit used
+    # and beta per pair of adjacent units; variable i * n + j is cell (i, j)
+    return build_grid_bqm(matrix, alpha, beta, allow_adjacent_penalty)
+
+# Solving the QUBO with the Simulated Annealing Sampler (or the checkerboard annealer, backend="checkerboard")
+def solve_qubo_with_neal(matrix, alpha=2, beta=4, num_reads=100, backend="neal", seed=None):
+    with instrumentation.timer("qubo_compile"):
+        bqm = matrix_to_qubo(matrix, alpha=alpha, beta=beta)
+    sampler = grid_sampler(backend, matrix.shape)
+    with instrumentation.timer("qubo_sample", backend=backend):
+        sampleset = sampler.sample(bqm, num_reads=num_reads, seed=seed)
+    solution, energy = best_solution(sampleset, matrix.shape)
+    record_solve_metrics(bqm, energy, backend)
+    return solution, energy
 
 # Visualization function
-def plot_all_heatmaps(original_map, resized_map, solution_map):
+def plot_all_heatmaps(original_map, resized_map, solution_map, path=None):
+    # Shows the figure, or with `path` saves it without opening a window
     fig, axes = plt.subplots(1, 3, figsize=(18, 6))
 
     im1 = axes[0].imshow(original_map, cmap="Blues", interpolation='nearest')
-    axes[0].set_title("Original Threat Map (250x250)")
+    axes[0].set_title(f"Original Threat Map ({original_map.shape[0]}x{original_map.shape[1]})")
     fig.colorbar(im1, ax=axes[0])
 
     im2 = axes[1].imshow(resized_map, cmap="Blues", interpolation='nearest')
-    axes[1].set_title("Resized Heatmap (50x50)")
+    axes[1].set_title(f"Resized Heatmap ({resized_map.shape[0]}x{resized_map.shape[1]})")
     fig.colorbar(im2, ax=axes[1])
 
     im3 = axes[2].imshow(solution_map, cmap="Blues", interpolation='nearest')
@@ -83,21 +58,42 @@ def plot_all_heatmaps(original_map, resized_map, solution_map):
     fig.colorbar(im3, ax=axes[2])
 
     plt.tight_layout()
-    plt.show()
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path)
+        plt.close(fig)
+
+def solve_danger_map(danger_map, alpha=7, beta=4, backend="neal", native_resolution=False, seed=None):
+    """
+    Deployment for a danger map: resized to 50x50 (or kept at full size) and solved. Returns (resized_map, solution, energy).
+    With native_resolution the tiles are always annealed by qubo_decompose.solve_tiled and `backend` is ignored.
+    """
+    if native_resolution:
+        # Keep every cell (rescaled to 0-9, any shape) and solve tile by tile
+        resized_map = rescale_heatmap(np.asarray(danger_map, dtype=float))
+        with instrumentation.timer("qubo_sample", backend="tiled"):
+            solution, energy = solve_tiled(resized_map, alpha=alpha, beta=beta, seed=seed)
+    else:
+        # Resize the original map directly to 50x50
+        resized_map = resize_heatmap(danger_map)
 
-# Main pipeline
-def run_qubo_pipeline():
-    # Get the full-size danger map
-    danger_map, _, _, _ = predict_fire_threat()
+        # Solve the QUBO problem
+        solution, energy = solve_qubo_with_neal(resized_map, alpha=alpha, beta=beta, backend=backend, seed=seed)
+    return resized_map, solution, energy
 
-    # Resize the original map directly to 50x50
-    resized_map = resize_heatmap(danger_map)
+# Main pipeline
+def run_qubo_pipeline(backend="neal", native_resolution=False, show=True, seed=None, cache=None):
+    # Get the full-size danger map; show=False runs without prompts or windows. With a seed and a
+    # scenario_cache.ScenarioCache, re-runs (e.g. to tune alpha/beta) load the map instead of re-simulating
+    threat = predict_fire_threat(seed=seed, cache=cache) if show else compute_fire_threat(seed=seed, cache=cache)
+    danger_map = threat[0]
 
-    # Solve the QUBO problem
-    solution, energy = solve_qubo_with_neal(resized_map, alpha=7, beta=4)
+    resized_map, solution, energy = solve_danger_map(danger_map, backend=backend, native_resolution=native_resolution, seed=seed)
 
     # Visualize
-    plot_all_heatmaps(danger_map, resized_map, solution)
+    if show:
+        plot_all_heatmaps(danger_map, resized_map, solution)
 
     # Print results
     print("Optimal Response Deployment:\n", solution)
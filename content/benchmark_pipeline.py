@@ -0,0 +1,244 @@
+"""
+Times every pipeline stage over a range of grid sizes and records peak memory, as JSON that
+can be compared between revisions.
+
+    python benchmark_pipeline.py --output before.json
+    python benchmark_pipeline.py --sizes 50 250 --stages forest fire_dense_front --output after.json
+    python benchmark_pipeline.py --compare before.json after.json
+
+Each stage runs `repeats` times per size with fixed seeds (setup is not timed), then once
+more under tracemalloc for the peak of Python and NumPy allocations. Stages skip sizes outside
+their range in STAGE_SIZE_LIMITS (an annealed 4000x4000 QUBO would run for hours, and the
+pipeline's 35-cell forest clumps need a grid of at least 70 cells to hold any trees).
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+
+SEED = 1234
+DEFAULT_SIZES = (50, 250, 1000, 4000)
+DEFAULT_REPEATS = 3
+FIRE_STEPS = 20
+SOLVE_READS = 10
+ENDPOINT_REQUESTS = 5
+REGRESSION_THRESHOLD = 1.10  # new / old time ratio reported as a regression
+
+# (smallest, largest) size each stage runs at; None = no limit
+STAGE_SIZE_LIMITS = {
+    "forest": (None, None),
+    "city_forest": (None, None),
+    "city_generator": (None, None),
+    "fire_sparse_front": (None, None),
+    "fire_dense_front": (None, None),
+    "fire_arrival": (None, None),
+    "fire_threat": (70, 1000),
+    "matrix_to_qubo": (None, 1000),
+    "solve_qubo": (None, 250),
+    "endpoint": (None, 50),
+}
+
+def _clump_scale(size):
+    # The pipeline's 35-cell clumps, shrunk on small grids so they still hold some forest
+    return min(35, size / 5)
+
+def _terrain(size):
+    # (forest, forest/city matrix with TREE cells) as the pipeline builds them
+    from Forest import generate_clumpy_forest
+    from Forest_City import generate_large_cluster_city_matrix
+    rng = np.random.default_rng(SEED)
+    forest = generate_clumpy_forest(size, clump_scale=_clump_scale(size), tree_ratio=0.5, seed=rng)
+    return forest, generate_large_cluster_city_matrix(size, forest, smoothness=50, distance_influence=0.2, center_bias=1.3, seed=rng)
+
+def _danger_map(size):
+    return np.random.default_rng(SEED).integers(0, 10, (size, size)).astype(float)
+
+# Each stage takes (size, options) and returns the function to time; work done before the
+# return is setup. The timed function may return a dict of extra measurements.
+
+def stage_forest(size, options):
+    from Forest import generate_clumpy_forest
+    return lambda: generate_clumpy_forest(size, clump_scale=_clump_scale(size), tree_ratio=0.5, seed=SEED)
+
+def stage_city_forest(size, options):
+    from Forest_City import generate_large_cluster_city_matrix
+    forest, _ = _terrain(size)
+    return lambda: generate_large_cluster_city_matrix(size, forest, smoothness=50, distance_influence=0.2, center_bias=1.3, seed=SEED)
+
+def stage_city_generator(size, options):
+    from city_generator import generate_large_cluster_city_matrix
+    return lambda: generate_large_cluster_city_matrix(size, smoothness=4.0, seed=SEED)
+
+def _fire_steps(fire_sim):
+    def run():
+        for _ in range(FIRE_STEPS):
+            fire_sim.step()
+        return {"steps": FIRE_STEPS, "burning_cells": int(fire_sim.burning.sum())}
+    return run
+
+def stage_fire_sparse_front(size, options):
+    # One ignited tree: a small front, the usual start of a fire
+    from Fire_simulation import FireGrid
+    _, city = _terrain(size)
+    return _fire_steps(FireGrid(city, engine=options.fire_engine, seed=SEED))
+
+def stage_fire_dense_front(size, options):
+    # A fifth of all trees burning at once, at random points of their burn
+    from Fire_simulation import FireGrid, FIRE, TREE, BURN_DURATION
+    _, city = _terrain(size)
+    rng = np.random.default_rng(SEED)
+    city[(city == TREE) & (rng.random(city.shape) < 0.2)] = FIRE
+    fire_time = rng.integers(1, BURN_DURATION + 1, city.shape)
+    return _fire_steps(FireGrid(city, engine=options.fire_engine, seed=SEED, fire_time=fire_time))
+
+def stage_fire_arrival(size, options):
+    # Ignition times over the same FIRE_STEPS steps, event by event
+    from Fire_arrival import FireArrival
+    _, city = _terrain(size)
+    arrival = FireArrival(city, seed=SEED)
+    def run():
+        first_ignition, ignitions = arrival.run(FIRE_STEPS)
+        return {"steps": FIRE_STEPS, "ignitions": int(ignitions.sum())}
+    return run
+
+def stage_fire_threat(size, options):
+    from Firethreat import compute_fire_threat
+    return lambda: compute_fire_threat(grid_size=size, seed=SEED)
+
+def stage_matrix_to_qubo(size, options):
+    from Qooked import matrix_to_qubo, structure_cache
+    matrix = _danger_map(size)
+    def run():
+        structure_cache.clear()  # time a full build, not a cache hit
+        matrix_to_qubo(matrix, alpha=5, beta=4)
+    return run
+
+def stage_solve_qubo(size, options):
+    from Qooked import solve_qubo_with_neal
+    matrix = _danger_map(size)
+    return lambda: solve_qubo_with_neal(matrix, alpha=5, beta=4, num_reads=SOLVE_READS, backend=options.backend, seed=SEED)
+
+def stage_endpoint(size, options):
+    import Qooked
+    client = Qooked.app.test_client()
+    matrix = _danger_map(size).tolist()
+    def run():
+        # Distinct seeds so every request misses the result cache
+        Qooked.result_cache.clear()
+        start = time.perf_counter()
+        for seed in range(ENDPOINT_REQUESTS):
+            response = client.post("/solve_qubo", json={"matrix": matrix, "num_reads": SOLVE_READS, "backend": options.backend, "seed": seed})
+            if response.status_code != 200:
+                raise RuntimeError(response.get_json())
+        return {"requests": ENDPOINT_REQUESTS, "requests_per_second": ENDPOINT_REQUESTS / (time.perf_counter() - start)}
+    return run
+
+STAGES = {name: globals()[f"stage_{name}"] for name in STAGE_SIZE_LIMITS}
+
+def measure(stage, size, options):
+    """Median and min seconds over `options.repeats` runs, plus the tracemalloc peak of one more run."""
+    seconds = []
+    extra = {}
+    for _ in range(options.repeats):
+        run = STAGES[stage](size, options)
+        start = time.perf_counter()
+        extra = run()
+        seconds.append(time.perf_counter() - start)
+
+    run = STAGES[stage](size, options)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {"seconds_median": statistics.median(seconds), "seconds_min": min(seconds), "repeats": options.repeats, "peak_bytes": peak}
+    if isinstance(extra, dict):
+        result.update(extra)
+    return result
+
+def revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(options):
+    report = {
+        "revision": revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": SEED,
+        "settings": {"fire_engine": options.fire_engine, "backend": options.backend, "fire_steps": FIRE_STEPS, "solve_reads": SOLVE_READS},
+        "results": {},
+    }
+    for stage in options.stages:
+        report["results"][stage] = {}
+        for size in options.sizes:
+            smallest, largest = STAGE_SIZE_LIMITS[stage]
+            if not options.no_limits and ((smallest and size < smallest) or (largest and size > largest)):
+                report["results"][stage][str(size)] = {"skipped": f"outside the {smallest}..{largest} size range"}
+                continue
+            result = measure(stage, size, options)
+            report["results"][stage][str(size)] = result
+            print(f"{stage:>18} {size:>5}: {result['seconds_median']:9.4f} s  {result['peak_bytes'] / 2**20:9.1f} MiB", file=sys.stderr)
+    return report
+
+def compare(old, new, threshold=REGRESSION_THRESHOLD):
+    """Rows of (stage, size, old seconds, new seconds, ratio, verdict) for results both reports have."""
+    rows = []
+    for stage, sizes in new["results"].items():
+        for size, result in sizes.items():
+            before = old["results"].get(stage, {}).get(size)
+            if not before or "skipped" in before or "skipped" in result:
+                continue
+            ratio = result["seconds_median"] / before["seconds_median"]
+            verdict = "regression" if ratio > threshold else "speedup" if ratio < 1 / threshold else ""
+            rows.append((stage, size, before["seconds_median"], result["seconds_median"], ratio, verdict))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the fire/threat/deployment pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--fire-engine", default="vectorized", choices=["loop", "vectorized", "sparse"])
+    parser.add_argument("--backend", default="neal", choices=["neal", "checkerboard"])
+    parser.add_argument("--no-limits", action="store_true", help="run every stage at every size")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two reports instead of running")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    options = parser.parse_args(argv)
+
+    if options.compare:
+        with open(options.compare[0]) as f:
+            old = json.load(f)
+        with open(options.compare[1]) as f:
+            new = json.load(f)
+        rows = compare(old, new, options.threshold)
+        print(f"{old.get('revision')} -> {new.get('revision')}")
+        for stage, size, before, after, ratio, verdict in rows:
+            print(f"{stage:>18} {size:>5}: {before:9.4f} s -> {after:9.4f} s  x{ratio:5.2f}  {verdict}")
+        return 1 if any(row[-1] == "regression" for row in rows) else 0
+
+    report = run_benchmarks(options)
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
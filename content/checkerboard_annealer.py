@@ -0,0 +1,194 @@
+import numpy as np
+import dimod
+
+DEFAULT_NUM_SWEEPS = 1000
+
+def grid_couplings(bqm, shape):
+    """
+    Split a BQM over variables 0..rows*cols-1 (cell (i, j) = i * cols + j) into linear (rows, cols),
+    horizontal (rows, cols - 1) and vertical (rows - 1, cols) coupling arrays, plus the offset.
+    Raises ValueError if the BQM couples anything but 4-neighbors.
+    """
+    rows, cols = shape
+    size = rows * cols
+    if set(bqm.variables) != set(range(size)):
+        raise ValueError(f"Expected variables 0..{size - 1} for a {rows}x{cols} grid.")
+    linear, (first, second, weights), offset = bqm.to_numpy_vectors(variable_order=range(size))
+    first, second = np.minimum(first, second), np.maximum(first, second)
+
+    horizontal = np.zeros((rows, cols - 1))
+    vertical = np.zeros((rows - 1, cols))
+    is_horizontal = (second - first == 1) & (second % cols != 0)
+    is_vertical = second - first == cols
+    if not np.all(is_horizontal | is_vertical):
+        raise ValueError("The checkerboard annealer only handles couplings between 4-neighbor grid cells.")
+    horizontal.ravel()[(first // cols * (cols - 1) + first % cols)[is_horizontal]] = weights[is_horizontal]
+    vertical.ravel()[first[is_vertical]] = weights[is_vertical]
+    return linear.reshape(shape), horizontal, vertical, offset
+
+def grid_energy(samples, linear, horizontal, vertical):
+    """QUBO energy of 0/1 samples with shape (..., rows, cols)."""
+    samples = samples.astype(float)
+    return ((samples * linear).sum(axis=(-2, -1))
+            + (samples[..., :, :-1] * samples[..., :, 1:] * horizontal).sum(axis=(-2, -1))
+            + (samples[..., :-1, :] * samples[..., 1:, :] * vertical).sum(axis=(-2, -1)))
+
+def default_beta_range(linear, horizontal, vertical):
+    """Hot and cold inverse temperatures: the largest flip is likely at first, the smallest rare at the end."""
+    coupling = np.zeros(linear.shape)
+    coupling[:, :-1] += np.abs(horizontal)
+    coupling[:, 1:] += np.abs(horizontal)
+    coupling[:-1, :] += np.abs(vertical)
+    coupling[1:, :] += np.abs(vertical)
+    max_delta = (np.abs(linear) + coupling).max()
+
+    terms = np.abs(np.concatenate([linear.ravel(), horizontal.ravel(), vertical.ravel()]))
+    terms = terms[terms > 0]
+    if max_delta == 0 or len(terms) == 0:
+        return 0.1, 1.0
+    return np.log(2) / max_delta, np.log(100) / terms.min()
+
+def _sublattice_couplings(horizontal, vertical, rows, cols):
+    """
+    Couplings between the two checkerboard colors, each color stored as a flat (rows * cols // 2)
+    vector with cell (i, j) at i * (cols // 2) + j // 2 (cols must be even).
+    Returns, per color, {offset: weights}: weights[p] couples cell p of that color to cell
+    p + offset of the other color (0 where there is no such neighbor).
+    """
+    half = cols // 2
+    i, j = np.indices((rows, cols))
+    position = i * half + j // 2
+    color = (i + j) % 2
+
+    # Coupling to the neighbor in each direction, 0 off the grid
+    toward = {
+        (0, 1): np.pad(horizontal, ((0, 0), (0, 1))), (0, -1): np.pad(horizontal, ((0, 0), (1, 0))),
+        (1, 0): np.pad(vertical, ((0, 1), (0, 0))), (-1, 0): np.pad(vertical, ((1, 0), (0, 0))),
+    }
+    couplings = ({}, {})
+    for (dy, dx), weights in toward.items():
+        offset = (i + dy) * half + (j + dx) // 2 - position
+        for c in (0, 1):
+            mine = color == c
+            for o in np.unique(offset[mine]):
+                selected = mine & (offset == o)
+                vector = couplings[c].setdefault(int(o), np.zeros(rows * half, dtype=np.float32))
+                vector[position[selected]] += weights[selected]
+    return tuple({o: w for o, w in c.items() if w.any()} for c in couplings)
+
+def anneal_grid(linear, horizontal, vertical, num_reads=100, num_sweeps=DEFAULT_NUM_SWEEPS, beta_range=None, seed=None,
+                initial_states=None, frozen=None):
+    """
+    Simulated annealing of a grid QUBO with all reads in one (reads, rows, cols) array.
+    With only 4-neighbor couplings the cells split into the two colors of a checkerboard; no cell
+    is coupled to a cell of its own color, so each half-sweep does a Metropolis update of every
+    cell of one color at once. The beta schedule is geometric over `beta_range` (hot, cold),
+    by default picked from the coefficients as neal does.
+    - initial_states: 0/1 start states, (reads, rows, cols) or one (rows, cols) grid for every
+      read; random by default. To refine a known solution, pair it with a cold beta_range.
+    - frozen: boolean (rows, cols) mask of cells that keep their initial state.
+    Returns (samples, energies), samples as int8.
+    """
+    rng = np.random.default_rng(seed)
+    # The sweeps run in float32; the returned energies use the coefficients as given
+    coefficients = [np.asarray(terms, dtype=float) for terms in (linear, horizontal, vertical)]
+    linear = np.asarray(linear, dtype=np.float32)
+    horizontal = np.asarray(horizontal, dtype=np.float32)
+    vertical = np.asarray(vertical, dtype=np.float32)
+    rows, cols = linear.shape
+    if beta_range is None:
+        beta_range = default_beta_range(linear, horizontal, vertical)
+    betas = np.geomspace(beta_range[0], beta_range[1], num_sweeps).astype(np.float32)
+
+    # An odd width gets a free dummy column (no field, no couplings), dropped at the end
+    padded = cols + cols % 2
+    pad = ((0, 0), (0, padded - cols))
+    linear_padded = np.pad(linear, pad)
+    couplings = _sublattice_couplings(np.pad(horizontal, pad), np.pad(vertical, pad), rows, padded)
+    half = padded // 2
+    size = rows * half
+    colors = (np.add.outer(np.arange(rows), np.arange(padded)) % 2).ravel()
+    linear_colors = [linear_padded.ravel()[colors == c] for c in (0, 1)]
+    movable = np.ones(rows * padded, dtype=bool) if frozen is None else ~np.pad(np.asarray(frozen, dtype=bool), pad).ravel()
+    movable_colors = [movable[colors == c] for c in (0, 1)]
+
+    # Each color of each read is one flat vector, so the neighbors of a color are the other
+    # color shifted by a few fixed offsets
+    if initial_states is None:
+        spins = rng.integers(0, 2, size=(2, num_reads, size)).astype(np.float32)
+    else:
+        initial = np.broadcast_to(initial_states, (num_reads, rows, cols))
+        initial = np.pad(initial, ((0, 0),) + pad).reshape(num_reads, -1)
+        spins = np.ascontiguousarray(np.stack([initial[:, colors == c] for c in (0, 1)]), dtype=np.float32)
+    uniform = np.empty_like(spins)
+    field = np.empty((num_reads, size), dtype=np.float32)
+    scratch = np.empty_like(field)
+    flip = np.empty(field.shape, dtype=bool)
+    for beta in betas:
+        rng.random(dtype=np.float32, out=uniform)
+        for c in (0, 1):
+            samples, other = spins[c], spins[1 - c]
+
+            # Local field: linear + couplings to set neighbors
+            field[...] = linear_colors[c]
+            for offset, weights in couplings[c].items():
+                lo, hi = max(0, -offset), size - max(0, offset)
+                np.multiply(weights[lo:hi], other[:, lo + offset:hi + offset], out=scratch[:, lo:hi])
+                field[:, lo:hi] += scratch[:, lo:hi]
+
+            # Metropolis: flipping changes the energy by (1 - 2x) * field; accept with probability
+            # min(1, exp(-beta * change)), i.e. exp of min(0, beta * (2x - 1) * field)
+            np.multiply(samples, 2 * beta, out=scratch)
+            scratch -= beta
+            field *= scratch
+            np.minimum(field, 0, out=field)
+            np.exp(field, out=field)
+            np.less(uniform[c], field, out=flip)
+            flip &= movable_colors[c]
+
+            # x -> 1 - x on flipped cells, as x += (1 - 2x) * flip
+            np.multiply(samples, -2, out=scratch)
+            scratch += 1
+            scratch *= flip
+            samples += scratch
+
+    grid = np.empty((num_reads, rows * padded), dtype=np.int8)
+    for c in (0, 1):
+        grid[:, colors == c] = spins[c]
+    samples = grid.reshape(num_reads, rows, padded)[:, :, :cols]
+    return samples, grid_energy(samples, *coefficients)
+
+class CheckerboardSampler(dimod.Sampler):
+    """
+    Drop-in for neal.SimulatedAnnealingSampler on grid-structured QUBOs (such as grid_qubo.build_grid_bqm),
+    backed by anneal_grid. `shape` is the grid the variables 0..rows*cols-1 are laid out on;
+    square grids are detected when it is left out.
+    """
+    parameters = {"num_reads": [], "num_sweeps": [], "beta_range": [], "seed": []}
+    properties = {}
+
+    def __init__(self, shape=None):
+        self.shape = shape
+
+    def sample(self, bqm, num_reads=100, num_sweeps=DEFAULT_NUM_SWEEPS, beta_range=None, seed=None):
+        bqm = bqm.change_vartype(dimod.BINARY, inplace=False)
+        shape = self.shape
+        if shape is None:
+            side = int(round(np.sqrt(bqm.num_variables)))
+            if side * side != bqm.num_variables:
+                raise ValueError("Pass the grid shape to CheckerboardSampler for non-square grids.")
+            shape = (side, side)
+
+        linear, horizontal, vertical, offset = grid_couplings(bqm, shape)
+        samples, energies = anneal_grid(linear, horizontal, vertical, num_reads, num_sweeps, beta_range, seed)
+        return dimod.SampleSet.from_samples((samples.reshape(num_reads, -1), range(bqm.num_variables)),
+                                            dimod.BINARY, energies + offset)
+
+def grid_sampler(backend, shape):
+    """Sampler for a grid QUBO of `shape`: "neal" (the generic SimulatedAnnealingSampler) or "checkerboard"."""
+    if backend == "checkerboard":
+        return CheckerboardSampler(shape)
+    if backend == "neal":
+        from neal import SimulatedAnnealingSampler
+        return SimulatedAnnealingSampler()
+    raise ValueError(f"Unknown sampler backend {backend!r}; expected 'neal' or 'checkerboard'.")
@@ -2,13 +2,14 @@ import numpy as np
 from scipy.ndimage import gaussian_filter
 import matplotlib.pyplot as plt
 
-def generate_large_cluster_city_matrix(size, smoothness=4.0):
+def generate_large_cluster_city_matrix(size, smoothness=4.0, seed=None):
     """
     Generates a city layout matrix with larger and more distinct clusters of high and low density areas.
     - `smoothness`: Controls the spread of the density regions. Higher values result in larger clusters.
+    - `seed`: int, SeedSequence or Generator for the noise.
     """
     # Generate random noise matrix
-    raw_noise = np.random.rand(size, size)  # values between 0 and 1
+    raw_noise = np.random.default_rng(seed).random((size, size))  # values between 0 and 1
     
     # Apply a Gaussian filter with a larger sigma to create larger clusters
     smoothed = gaussian_filter(raw_noise, sigma=smoothness)
@@ -0,0 +1,46 @@
+import numpy as np
+import dimod
+import instrumentation
+
+def grid_edges(shape):
+    """Flat (row-major) index pairs of every horizontally or vertically adjacent pair of cells."""
+    index = np.arange(shape[0] * shape[1]).reshape(shape)
+    first = np.concatenate([index[:, :-1].ravel(), index[:-1, :].ravel()])
+    second = np.concatenate([index[:, 1:].ravel(), index[1:, :].ravel()])
+    return first, second
+
+def grid_qubo_coefficients(matrix, alpha, beta, allow_adjacent_penalty=True):
+    """
+    QUBO coefficients of the deployment problem on a danger matrix, indexed by flat cell index:
+    H = -sum(matrix * x) + alpha * sum(x) + beta * sum(x_i * x_j over 4-neighbor pairs)
+    Returns (linear, (first, second, weights)).
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    linear = float(alpha) - matrix.ravel()
+    if allow_adjacent_penalty:
+        first, second = grid_edges(matrix.shape)
+    else:
+        first = second = np.empty(0, dtype=int)
+    return linear, (first, second, np.full(len(first), float(beta)))
+
+def build_grid_bqm(matrix, alpha, beta, allow_adjacent_penalty=True):
+    """BinaryQuadraticModel of the deployment problem; variable i * cols + j is cell (i, j)."""
+    linear, quadratic = grid_qubo_coefficients(matrix, alpha, beta, allow_adjacent_penalty)
+    return dimod.BinaryQuadraticModel.from_numpy_vectors(linear, quadratic, 0.0, dimod.BINARY)
+
+def best_solution(sampleset, shape):
+    """Lowest-energy sample of a grid BQM as a 0/1 matrix of `shape`, with its energy."""
+    best = np.argmin(sampleset.record.energy)
+    order = np.fromiter(sampleset.variables, dtype=np.intp, count=len(sampleset.variables))
+    solution = np.zeros(shape[0] * shape[1])
+    solution[order] = sampleset.record.sample[best]
+    return solution.reshape(shape), float(sampleset.record.energy[best])
+
+def record_solve_metrics(bqm, energy, backend):
+    """Problem size and result of one solve, for the instrumentation counters."""
+    if not instrumentation.enabled:
+        return
+    instrumentation.count("qubo_solves_total", backend=backend)
+    instrumentation.gauge("qubo_variables", bqm.num_variables)
+    instrumentation.gauge("qubo_interactions", bqm.num_interactions)
+    instrumentation.gauge("qubo_energy", energy, backend=backend)
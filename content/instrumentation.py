@@ -0,0 +1,138 @@
+"""
+Process-wide stage timers, counters and gauges, exported as Prometheus text or a Chrome trace.
+
+Everything is off until enable() is called (or PIPELINE_METRICS=1 is set); while off, timer()
+hands back a shared do-nothing context manager and the other calls return after one flag check,
+so instrumented code costs next to nothing. Callers that would need extra work to compute a
+metric check `instrumentation.enabled` first.
+
+    instrumentation.enable(trace=True)
+    with instrumentation.timer("qubo_sample", backend="neal"):
+        ...
+    instrumentation.dump_trace("run.trace.json")   # open in chrome://tracing or Perfetto
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+enabled = os.environ.get("PIPELINE_METRICS", "0") not in ("", "0")
+tracing = False
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> total
+_gauges = {}      # (name, labels) -> last value
+_summaries = {}   # (name, labels) -> [count, sum]
+_trace_events = []
+_origin = time.perf_counter()
+
+def enable(trace=False):
+    """Start collecting; with trace=True also keep every timed span and step for dump_trace."""
+    global enabled, tracing
+    enabled = True
+    tracing = trace
+
+def disable():
+    global enabled, tracing
+    enabled = tracing = False
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _summaries.clear()
+        _trace_events.clear()
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def count(name, value=1, **labels):
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def gauge(name, value, **labels):
+    if not enabled:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+def observe(name, seconds, start=None, args=None, **labels):
+    """Record one duration under `name` (and, when tracing, a span that began at perf_counter() `start`)."""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        summary = _summaries.setdefault(key, [0, 0.0])
+        summary[0] += 1
+        summary[1] += seconds
+        if tracing:
+            start = time.perf_counter() - seconds if start is None else start
+            _trace_events.append({
+                "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                "ts": (start - _origin) * 1e6, "dur": seconds * 1e6, "args": {**labels, **(args or {})},
+            })
+
+@contextmanager
+def _timed(name, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(f"{name}_seconds", time.perf_counter() - start, start=start, **labels)
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+def timer(name, **labels):
+    """Context manager adding the time spent in the block to the `<name>_seconds` summary."""
+    if not enabled:
+        return _NULL_TIMER
+    return _timed(name, labels)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{str(value)}"' for key, value in labels) + "}"
+
+def prometheus_text(scrape_gauges=()):
+    """
+    All metrics in the Prometheus text exposition format. scrape_gauges holds (name, value, labels)
+    read by the caller at scrape time; they are emitted even while collection is off, under a
+    comment saying so.
+    """
+    lines = [] if enabled else ["# Metrics collection is off (set PIPELINE_METRICS=1 or call instrumentation.enable()); "
+                                "only scrape-time gauges are reported."]
+    with _lock:
+        gauges = dict(_gauges)
+        gauges.update((_key(name, labels), value) for name, value, labels in scrape_gauges)
+        for kind, metrics in (("counter", _counters), ("gauge", gauges)):
+            for name in sorted({name for name, _ in metrics}):
+                lines.append(f"# TYPE {name} {kind}")
+                for (metric, labels), value in sorted(metrics.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name in sorted({name for name, _ in _summaries}):
+            lines.append(f"# TYPE {name} summary")
+            for (metric, labels), (samples, total) in sorted(_summaries.items()):
+                if metric == name:
+                    lines.append(f"{name}_count{_format_labels(labels)} {samples}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+    return "\n".join(lines) + "\n"
+
+def dump_trace(path):
+    """Write the traced spans as a Chrome trace (JSON object format)."""
+    with _lock:
+        events = list(_trace_events)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
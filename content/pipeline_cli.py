@@ -0,0 +1,115 @@
+"""
+Headless forest -> city -> fire -> threat -> QUBO pipeline.
+
+    python pipeline_cli.py --seed 7 --count 100 --output-dir runs
+    python pipeline_cli.py --config scenario.json --render
+
+A JSON config holds the same settings as the flags (with underscores, e.g. "wind_speed");
+flags given on the command line override it. Scenario i of --count uses seed + i and writes
+danger_map.npy, fire_time.npy, solution.npy and summary.json to <output-dir>/scenario_<seed>;
+--render also saves PNGs there, --trace writes a Chrome trace of every stage and fire step
+and --metrics the final counters in Prometheus text. With --cache-dir, scenarios already run
+with the same settings load their terrain and threat maps from the scenario cache, so sweeps
+over --alpha/--beta/--backend only re-solve. Nothing opens a window or waits for input.
+"""
+import argparse
+import json
+import os
+import time
+import matplotlib
+matplotlib.use("Agg")  # before pyplot is imported by the pipeline modules
+import numpy as np
+import instrumentation
+from scenario_cache import ScenarioCache, DEFAULT_MAX_BYTES
+from Firethreat import compute_fire_threat, plot_danger_map, GRID_SIZE, FUTURE_STEPS, DEFAULT_INITIAL_STEPS
+from ShunkQUBO import solve_danger_map, plot_all_heatmaps
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run the fire threat and deployment pipeline without a GUI.")
+    parser.add_argument("--config", help="JSON file with default settings")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first scenario")
+    parser.add_argument("--count", type=int, default=1, help="number of scenarios (seeds seed .. seed + count - 1)")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE)
+    parser.add_argument("--initial-steps", type=int, default=DEFAULT_INITIAL_STEPS, help="fire steps before the threat forecast")
+    parser.add_argument("--future-steps", type=int, default=FUTURE_STEPS, help="steps the threat forecast looks ahead")
+    parser.add_argument("--ensemble-size", type=int, default=0, help="forecast with this many fire runs (0 = one rollout)")
+    parser.add_argument("--mean-field", action="store_true", help="forecast the expected danger in one deterministic pass (Fire_probability)")
+    parser.add_argument("--wind-direction", type=float, default=0.0)
+    parser.add_argument("--wind-speed", type=float, default=0.0)
+    parser.add_argument("--slope", type=float, default=0.0)
+    parser.add_argument("--slope-direction", type=float, default=0.0)
+    parser.add_argument("--alpha", type=float, default=7)
+    parser.add_argument("--beta", type=float, default=4)
+    parser.add_argument("--backend", choices=["neal", "checkerboard"], default="neal")
+    parser.add_argument("--native-resolution", action="store_true", help="solve the full map tile by tile instead of a 50x50 resize (ignores --backend)")
+    parser.add_argument("--output-dir", default="pipeline_output")
+    parser.add_argument("--render", action="store_true", help="also save PNG figures")
+    parser.add_argument("--trace", help="write a Chrome trace (chrome://tracing, Perfetto) of the run here")
+    parser.add_argument("--metrics", help="write the run's metrics here in Prometheus text format")
+    parser.add_argument("--cache-dir", help="load and store terrain and threat maps in this scenario cache")
+    parser.add_argument("--cache-max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+    return parser
+
+def parse_args(argv=None):
+    parser = build_parser()
+    known, _ = parser.parse_known_args(argv)
+    if known.config:
+        with open(known.config) as f:
+            parser.set_defaults(**json.load(f))
+    return parser.parse_args(argv)
+
+def run_scenario(args, seed, cache=None):
+    """Run one scenario and write its outputs; returns the summary."""
+    directory = os.path.join(args.output_dir, f"scenario_{seed}")
+    os.makedirs(directory, exist_ok=True)
+    timings = {}
+
+    start = time.perf_counter()
+    danger_map, fire_time, city, forest = compute_fire_threat(
+        args.initial_steps, args.grid_size, args.future_steps, ensemble_size=args.ensemble_size or None, mean_field=args.mean_field,
+        seed=seed, cache=cache,
+        wind_direction=args.wind_direction, wind_speed=args.wind_speed, slope=args.slope, slope_direction=args.slope_direction)
+    timings["threat"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    resized_map, solution, energy = solve_danger_map(danger_map, args.alpha, args.beta, args.backend, args.native_resolution, seed=seed)
+    timings["deployment"] = time.perf_counter() - start
+
+    np.save(os.path.join(directory, "danger_map.npy"), danger_map.astype(np.int8))
+    np.save(os.path.join(directory, "fire_time.npy"), fire_time)
+    np.save(os.path.join(directory, "solution.npy"), solution.astype(np.int8))
+
+    if args.render:
+        start = time.perf_counter()
+        plot_danger_map(danger_map, args.future_steps, path=os.path.join(directory, "danger_map.png"))
+        plot_all_heatmaps(danger_map, resized_map, solution, path=os.path.join(directory, "deployment.png"))
+        timings["render"] = time.perf_counter() - start
+
+    summary = {
+        "seed": seed,
+        "energy": energy,
+        "units_used": int(solution.sum()),
+        "solution_shape": list(solution.shape),
+        "timings": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+    }
+    with open(os.path.join(directory, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.trace or args.metrics:
+        instrumentation.enable(trace=bool(args.trace))
+    cache = ScenarioCache(args.cache_dir, args.cache_max_bytes) if args.cache_dir else None
+    for seed in range(args.seed, args.seed + args.count):
+        summary = run_scenario(args, seed, cache)
+        print(json.dumps(summary))
+
+    if args.trace:
+        instrumentation.dump_trace(args.trace)
+    if args.metrics:
+        with open(args.metrics, "w") as f:
+            f.write(instrumentation.prometheus_text())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import base64
+import io
+import json
+from concurrent.futures import as_completed
+import numpy as np
+
+MAX_BATCH_SIZE = 500
+
+def decode_array(payload):
+    """
+    Array from a request field, in any of:
+    - a (nested) JSON list
+    - {"dtype": "<f8", "shape": [n, m], "data": base64 of the raw C-order buffer}
+    - {"npy": base64 of a .npy file}
+    """
+    if not isinstance(payload, dict):
+        return np.array(payload)
+    if "npy" in payload:
+        return np.load(io.BytesIO(base64.b64decode(payload["npy"])), allow_pickle=False)
+    dtype = np.dtype(payload["dtype"])
+    if dtype.hasobject:
+        raise ValueError("Object arrays can't be sent as raw buffers.")
+    return np.frombuffer(base64.b64decode(payload["data"]), dtype=dtype).reshape(payload["shape"])
+
+def encode_array(array):
+    """Inverse of decode_array's raw-buffer form."""
+    array = np.ascontiguousarray(array)
+    return {"dtype": array.dtype.str, "shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+def stream_batch(pool, solve, problems, ids):
+    """
+    Solves every problem (a tuple of solve's arguments) on `pool` and yields one NDJSON line per
+    problem as soon as it finishes, so lines come in completion order and carry the problem's
+    index and id. A failing problem yields an "error" line instead of ending the stream.
+    """
+    futures = {pool.submit(solve, *problem): index for index, problem in enumerate(problems)}
+    try:
+        for future in as_completed(futures):
+            index = futures[future]
+            line = {"index": index, "id": ids[index]}
+            try:
+                solution, energy = future.result()
+                line.update(solution=encode_array(solution.astype(np.uint8)), energy=round(energy, 4),
+                            units_used=int(solution.sum()))
+            except Exception as e:
+                line["error"] = str(e)
+            yield json.dumps(line) + "\n"
+    finally:
+        # The client may hang up mid-stream; don't keep solving for nobody
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,91 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from grid_qubo import build_grid_bqm
+
+DEFAULT_STRUCTURE_CACHE_SIZE = 32
+DEFAULT_RESULT_CACHE_SIZE = 1024
+DEFAULT_TTL = 3600.0
+
+class LRUCache:
+    """
+    Thread-safe mapping that holds at most `maxsize` entries, dropping the least recently used,
+    and forgets entries `ttl` seconds after they were stored (ttl=None keeps them until evicted).
+    """
+
+    def __init__(self, maxsize, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and self.clock() - entry[1] > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+def cached_grid_bqm(cache, matrix, alpha, beta, allow_adjacent_penalty=True):
+    """
+    build_grid_bqm(matrix, alpha, beta) from a cached model: the quadratic part (and the alpha
+    in every linear term) only depends on (shape, alpha, beta), so only -matrix is filled in.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    key = (matrix.shape, float(alpha), float(beta), allow_adjacent_penalty)
+    structure = cache.get(key)
+    if structure is None:
+        structure = build_grid_bqm(np.zeros(matrix.shape), alpha, beta, allow_adjacent_penalty)
+        cache.put(key, structure)
+    bqm = structure.copy()
+    bqm.add_linear_from_array(-matrix.ravel())
+    return bqm
+
+def result_key(matrix, *params):
+    """Digest of a matrix (values, dtype and shape) and the solver parameters."""
+    matrix = np.ascontiguousarray(matrix)
+    digest = hashlib.sha256()
+    digest.update(repr((matrix.shape, matrix.dtype.str, params)).encode())
+    digest.update(matrix.tobytes())
+    return digest.hexdigest()
@@ -0,0 +1,133 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.ndimage import binary_dilation, label, find_objects
+from checkerboard_annealer import anneal_grid, grid_energy, default_beta_range
+
+DEFAULT_TILE_SIZE = 50
+DEFAULT_ROUNDS = 4
+DEFAULT_TILE_READS = 8
+DEFAULT_TILE_SWEEPS = 200
+
+def deployment_terms(matrix, alpha, beta):
+    """linear, horizontal and vertical coupling arrays of the deployment QUBO (see grid_qubo)."""
+    matrix = np.asarray(matrix, dtype=float)
+    rows, cols = matrix.shape
+    return alpha - matrix, np.full((rows, cols - 1), float(beta)), np.full((rows - 1, cols), float(beta))
+
+def boundary_field(solution, horizontal, vertical, rows, cols):
+    """
+    Linear terms a block of `solution` gets from its fixed 4-neighbors outside the block:
+    x_i * J_ij * x_j with x_j fixed is just J_ij * x_j added to x_i's linear term.
+    """
+    field = np.zeros((rows.stop - rows.start, cols.stop - cols.start))
+    if rows.start > 0:
+        field[0] += vertical[rows.start - 1, cols] * solution[rows.start - 1, cols]
+    if rows.stop < solution.shape[0]:
+        field[-1] += vertical[rows.stop - 1, cols] * solution[rows.stop, cols]
+    if cols.start > 0:
+        field[:, 0] += horizontal[rows, cols.start - 1] * solution[rows, cols.start - 1]
+    if cols.stop < solution.shape[1]:
+        field[:, -1] += horizontal[rows, cols.stop - 1] * solution[rows, cols.stop]
+    return field
+
+def _solve_tile(linear, horizontal, vertical, num_reads, num_sweeps, seed):
+    samples, energies = anneal_grid(linear, horizontal, vertical, num_reads, num_sweeps, seed=seed)
+    best = np.argmin(energies)
+    return samples[best], energies[best]
+
+def _tiles(shape, tile_size, shift):
+    """Tile bounds, with the tile grid moved by `shift` cells so seams differ between rounds."""
+    edges = [sorted({0, n} | set(range(tile_size - shift, n, tile_size))) for n in shape]
+    return [((ty, tx), (slice(y0, y1), slice(x0, x1)))
+            for ty, (y0, y1) in enumerate(zip(edges[0][:-1], edges[0][1:]))
+            for tx, (x0, x1) in enumerate(zip(edges[1][:-1], edges[1][1:]))]
+
+def solve_tiled(matrix, alpha, beta, tile_size=DEFAULT_TILE_SIZE, rounds=DEFAULT_ROUNDS, num_reads=DEFAULT_TILE_READS,
+                num_sweeps=DEFAULT_TILE_SWEEPS, workers=None, seed=None, initial=None):
+    """
+    Deployment QUBO at full resolution by block Gauss-Seidel over tiles.
+    - Each tile is annealed with everything outside it held fixed; the adjacency penalty across
+      its edges becomes a boundary field on its linear terms, so seams are handled exactly.
+    - Tiles are colored like a checkerboard: same-colored tiles share no edge, so all tiles of
+      one color are solved at once on a process pool, then the other color sees their answers.
+    - Every other round the tile grid is shifted by half a tile, so the tiles overlap the
+      previous round's seams.
+    - A tile only takes a new assignment if it lowers the energy, so the energy never rises;
+      iteration stops after `rounds` rounds or the first round without improvement.
+    Returns (solution, energy) like solve_qubo_with_neal.
+    """
+    workers = workers or os.cpu_count()
+    linear, horizontal, vertical = deployment_terms(matrix, alpha, beta)
+    solution = np.zeros(linear.shape, dtype=np.int8) if initial is None else np.array(initial, dtype=np.int8)
+    energy = grid_energy(solution, linear, horizontal, vertical)
+    round_seeds = np.random.SeedSequence(seed).spawn(rounds)
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for round_seed, shift in zip(round_seeds, [0, tile_size // 2] * rounds):
+            tiles = _tiles(linear.shape, tile_size, shift)
+            tile_seeds = round_seed.spawn(len(tiles))
+            start_energy = energy
+            for color in (0, 1):
+                batch = [(bounds, tile_seed) for ((ty, tx), bounds), tile_seed in zip(tiles, tile_seeds) if (ty + tx) % 2 == color]
+                jobs = []
+                for (rows, cols), tile_seed in batch:
+                    tile_linear = linear[rows, cols] + boundary_field(solution, horizontal, vertical, rows, cols)
+                    jobs.append((tile_linear, horizontal[rows, cols.start:cols.stop - 1], vertical[rows.start:rows.stop - 1, cols],
+                                 num_reads, num_sweeps, tile_seed))
+                results = pool.map(_solve_tile, *zip(*jobs)) if pool else (_solve_tile(*job) for job in jobs)
+
+                # Same-colored tiles don't interact, so their answers can all be taken at once
+                for ((rows, cols), _), job, (tile_solution, tile_energy) in zip(batch, jobs, results):
+                    current = grid_energy(solution[rows, cols], *job[:3])
+                    if tile_energy < current:
+                        solution[rows, cols] = tile_solution
+                        energy += tile_energy - current
+            if energy >= start_energy:
+                break
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return solution.astype(float), float(grid_energy(solution, linear, horizontal, vertical))
+
+DEFAULT_MARGIN = 2
+
+def resolve_incremental(previous_matrix, matrix, previous_solution, alpha, beta, threshold=0.0, margin=DEFAULT_MARGIN,
+                        num_reads=DEFAULT_TILE_READS, num_sweeps=DEFAULT_TILE_SWEEPS, seed=None, warm_start=True):
+    """
+    Re-plan a deployment after the danger map changed from previous_matrix to matrix.
+    - Cells whose value moved by more than `threshold`, grown by `margin` cells, are the only
+      ones re-annealed; each connected region of them is annealed in its bounding box, with
+      every other cell (outside the box or not in the region) frozen at the previous solution.
+    - Reads start from the previous solution; with warm_start the schedule also starts at the
+      geometric middle of the beta range instead of hot, so it refines rather than re-randomizes.
+    - A region only takes a new assignment if it lowers the energy.
+    The work grows with the size of the changed regions, not the map. Returns (solution, energy).
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    linear, horizontal, vertical = deployment_terms(matrix, alpha, beta)
+    solution = np.array(previous_solution, dtype=np.int8)
+
+    changed = np.abs(matrix - np.asarray(previous_matrix, dtype=float)) > threshold
+    if margin and changed.any():
+        changed = binary_dilation(changed, iterations=margin)
+
+    # Regions that don't touch (even diagonally) share no coupling, so they're solved one by one
+    regions, count = label(changed, structure=np.ones((3, 3)))
+    for index, (box, region_seed) in enumerate(zip(find_objects(regions), np.random.SeedSequence(seed).spawn(count)), start=1):
+        rows, cols = box
+        terms = (linear[box] + boundary_field(solution, horizontal, vertical, rows, cols),
+                 horizontal[rows, cols.start:cols.stop - 1], vertical[rows.start:rows.stop - 1, cols])
+        beta_range = None
+        if warm_start:
+            hot, cold = default_beta_range(*terms)
+            beta_range = (np.sqrt(hot * cold), cold)
+        samples, energies = anneal_grid(*terms, num_reads, num_sweeps, beta_range, region_seed,
+                                        initial_states=solution[box], frozen=regions[box] != index)
+        best = np.argmin(energies)
+        if energies[best] < grid_energy(solution[box], *terms):
+            solution[box] = samples[best]
+
+    return solution.astype(float), float(grid_energy(solution, linear, horizontal, vertical))
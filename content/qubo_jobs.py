@@ -0,0 +1,141 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUED = 16
+DEFAULT_CHUNK_READS = 50
+DEFAULT_RETENTION = 600.0
+
+QUEUED, RUNNING, DONE, CANCELLED, EXPIRED, FAILED = "queued", "running", "done", "cancelled", "expired", "failed"
+FINISHED = {DONE, CANCELLED, EXPIRED, FAILED}
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_queued jobs are already waiting."""
+
+class Job:
+    def __init__(self, matrix, alpha, beta, num_reads, backend, seed, timeout):
+        self.id = uuid.uuid4().hex
+        self.matrix = matrix
+        self.params = dict(alpha=alpha, beta=beta, backend=backend)
+        self.num_reads = num_reads
+        self.seed = seed
+        self.submitted = time.monotonic()
+        self.deadline = None if timeout is None else self.submitted + timeout
+        self.started = self.finished = None
+        self.status = QUEUED
+        self.reads_done = 0
+        self.solution = self.energy = None
+        self.error = None
+        self.future = None
+        self.cancel_requested = threading.Event()
+
+    def summary(self):
+        now = time.monotonic()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "reads_done": self.reads_done,
+            "num_reads": self.num_reads,
+            "energy": None if self.energy is None else round(self.energy, 4),
+            "queued_seconds": round((self.started or self.finished or now) - self.submitted, 3),
+            "run_seconds": None if self.started is None else round((self.finished or now) - self.started, 3),
+            "error": self.error,
+        }
+
+class JobQueue:
+    """
+    Runs solves on a bounded thread pool.
+    - `solve(matrix, alpha, beta, num_reads, backend, seed)` returns (solution, energy); a job calls
+      it on chunks of `chunk_reads` reads and keeps the best answer, so cancellation and the
+      deadline are checked between chunks and an expired job still has its best solution so far.
+    - At most `max_queued` jobs wait for a worker; submit raises QueueFull beyond that.
+    - A job's timeout counts from submission, so time spent queued is included.
+    - Finished jobs are forgotten `retention` seconds after they finish.
+    """
+
+    def __init__(self, solve, workers=DEFAULT_WORKERS, max_queued=DEFAULT_MAX_QUEUED,
+                 chunk_reads=DEFAULT_CHUNK_READS, retention=DEFAULT_RETENTION):
+        self.solve = solve
+        self.max_queued = max_queued
+        self.chunk_reads = chunk_reads
+        self.retention = retention
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qubo-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, matrix, alpha, beta, num_reads, backend="neal", seed=None, timeout=None):
+        job = Job(matrix, alpha, beta, num_reads, backend, seed, timeout)
+        with self._lock:
+            self._purge()
+            if self.queued() >= self.max_queued:
+                raise QueueFull(f"{self.max_queued} jobs are already waiting.")
+            self._jobs[job.id] = job
+            job.future = self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a job: queued jobs never start, running jobs stop after their current chunk."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_requested.set()
+        if job.future.cancel():
+            self._finish(job, CANCELLED)
+        return job
+
+    def queued(self):
+        return sum(job.status == QUEUED for job in self._jobs.values())
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"max_queued": self.max_queued, "jobs": counts}
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel_requested.set()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _purge(self):
+        now = time.monotonic()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and now - job.finished > self.retention]:
+            del self._jobs[job_id]
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished = time.monotonic()
+        job.matrix = None
+
+    def _run(self, job):
+        job.status = RUNNING
+        job.started = time.monotonic()
+        # One child seed per chunk, so a seeded job is reproducible
+        chunk_seeds = iter(np.random.SeedSequence(job.seed).spawn(-(-job.num_reads // self.chunk_reads)))
+        try:
+            while job.reads_done < job.num_reads:
+                if job.cancel_requested.is_set():
+                    return self._finish(job, CANCELLED)
+                if job.deadline is not None and time.monotonic() >= job.deadline:
+                    return self._finish(job, EXPIRED)
+
+                reads = min(self.chunk_reads, job.num_reads - job.reads_done)
+                seed = int(next(chunk_seeds).generate_state(1)[0] >> 1)  # neal rejects seeds of 2**31 and up
+                solution, energy = self.solve(job.matrix, num_reads=reads, seed=seed, **job.params)
+                if job.energy is None or energy < job.energy:
+                    job.solution, job.energy = solution, energy
+                job.reads_done += reads
+            self._finish(job, DONE)
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, FAILED)
@@ -0,0 +1,118 @@
+"""
+On-disk cache of generated scenario stages (terrain, fire and threat maps).
+
+An entry is a directory of .npy files named by a sha256 over the stage name, its parameters
+(seed included) and the source of the modules that compute it, so editing a generator
+invalidates its entries without any manual versioning. Arrays are stored in the narrowest
+integer dtype that holds them and load memory-mapped. When the cache grows past `max_bytes`
+the least recently used entries are deleted.
+
+    cache = ScenarioCache("~/.cache/fire_scenarios")
+    arrays = cache.cached("terrain", {"grid_size": 250, "seed": 7}, make_terrain, sources=[Forest, Forest_City])
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+DEFAULT_MAX_BYTES = 2 * 2**30
+
+_source_hashes = {}  # path -> (mtime, sha256)
+
+def source_hash(paths):
+    """sha256 over the contents of the given source files (modules or paths)."""
+    digest = hashlib.sha256()
+    for path in paths:
+        path = getattr(path, "__file__", path)
+        mtime = os.path.getmtime(path)
+        cached = _source_hashes.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, "rb") as f:
+                cached = _source_hashes[path] = (mtime, hashlib.sha256(f.read()).hexdigest())
+        digest.update(cached[1].encode())
+    return digest.hexdigest()
+
+def narrow(array):
+    """`array` in the smallest dtype of its kind that holds its values exactly (integers and bools only)."""
+    array = np.asarray(array)
+    if array.dtype.kind not in "iu" or array.size == 0:
+        return array
+    return array.astype(np.result_type(np.min_scalar_type(array.min()), np.min_scalar_type(array.max())))
+
+class ScenarioCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, stage, params, sources=()):
+        text = json.dumps({"stage": stage, "params": params, "code": source_hash(sources)}, sort_keys=True, default=str)
+        return f"{stage}-{hashlib.sha256(text.encode()).hexdigest()[:32]}"
+
+    def get(self, key):
+        """{name: read-only memory-mapped array} of an entry, or None."""
+        path = os.path.join(self.directory, key)
+        try:
+            names = [name for name in os.listdir(path) if name.endswith(".npy")]
+            arrays = {name[:-4]: np.load(os.path.join(path, name), mmap_mode="r") for name in names}
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(path)  # the directory's mtime is its last use
+        self.hits += 1
+        return arrays
+
+    def put(self, key, arrays):
+        """Store {name: array}, then evict old entries if the cache is over its size limit."""
+        # Written next to the entry and renamed into place, so readers never see half an entry
+        staging = tempfile.mkdtemp(dir=self.directory, prefix=".staging-")
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(staging, f"{name}.npy"), narrow(array))
+            os.replace(staging, os.path.join(self.directory, key))
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(os.path.join(self.directory, key)):
+                raise
+        self.evict()
+
+    def cached(self, stage, params, compute, sources=()):
+        """Arrays of `stage` for `params`: loaded when cached, else compute() (a dict) stored and returned."""
+        key = self.key(stage, params, sources)
+        arrays = self.get(key)
+        if arrays is None:
+            arrays = compute()
+            self.put(key, arrays)
+        return arrays
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+            entries.append((os.path.getmtime(path), size, path))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self):
+        entries = self._entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries), "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
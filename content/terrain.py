@@ -0,0 +1,165 @@
+"""
+Forest and city layers built from smooth lattice noise, one tile at a time.
+
+Forest.generate_clumpy_forest and Forest_City.generate_large_cluster_city_matrix work on the
+whole map at full resolution (a sigma=50 gaussian_filter, a full distance transform). Here
+every smooth field is white noise on a coarse lattice, smoothed there, and evaluated at any
+cell with a cubic B-spline, so a tile costs two small matrix products and the map never has
+to exist at once. Map-wide statistics (the tree threshold and the normalizers) come from a
+low-resolution preview of the same fields.
+
+    terrain = TerrainGenerator(10000, seed=7)
+    write_terrain_tiles(directory, terrain.shape, terrain.tiles(1024))   # see Fire_tiled
+"""
+import numpy as np
+from scipy.ndimage import gaussian_filter, spline_filter, distance_transform_edt
+from Forest import TREE, EMPTY
+
+LATTICE_OVERSAMPLE = 2     # lattice points per smoothing sigma
+DEFAULT_MAX_DISTANCE = 64  # distance-to-forest cap (cells), also the tile halo
+PREVIEW_SIZE = 512
+DEFAULT_TILE_SIZE = 1024
+
+def _bspline_weights(coords, length):
+    """(len(coords), length) matrix evaluating a cubic B-spline with `length` coefficients at `coords`."""
+    base = np.floor(coords).astype(int)
+    u = (coords - base).astype(np.float32)
+    taps = [(1 - u) ** 3 / 6, (3 * u ** 3 - 6 * u ** 2 + 4) / 6, (-3 * u ** 3 + 3 * u ** 2 + 3 * u + 1) / 6, u ** 3 / 6]
+    weights = np.zeros((len(coords), length), dtype=np.float32)
+    rows = np.arange(len(coords))
+    for offset, tap in enumerate(taps):
+        np.add.at(weights, (rows, np.clip(base - 1 + offset, 0, length - 1)), tap)
+    return weights
+
+class LatticeNoise:
+    """
+    Smooth noise over a map of `shape` cells: white noise on a lattice with `spacing` cells
+    between points, optionally Gaussian-smoothed there by `sigma` (in cells), then a cubic
+    B-spline. With sigma set this stands in for gaussian_filter(white noise, sigma).
+    """
+
+    def __init__(self, shape, spacing, rng, sigma=0.0):
+        self.shape = shape
+        self.spacing = float(spacing)
+        # Enough extra lattice around the map for the smoothing and the spline support
+        self.pad = int(np.ceil(3 * sigma / self.spacing)) + 2
+        lattice_shape = tuple(int(np.ceil(n / self.spacing)) + 2 * self.pad for n in shape)
+        noise = rng.random(lattice_shape, dtype=np.float32)
+        if sigma:
+            noise = gaussian_filter(noise, sigma / self.spacing)
+        self.coefficients = spline_filter(noise, order=3, output=np.float32)
+
+    def _coords(self, start, stop, step=1):
+        return (np.arange(start, stop, step) + 0.5) / self.spacing - 0.5 + self.pad
+
+    def sample(self, rows, cols, step=1):
+        """Values over the cells [rows] x [cols] (slices), every `step` cells."""
+        wy = _bspline_weights(self._coords(rows.start, rows.stop, step), self.coefficients.shape[0])
+        wx = _bspline_weights(self._coords(cols.start, cols.stop, step), self.coefficients.shape[1])
+        # Only the lattice rows/columns the block touches take part in the products
+        used_y = np.flatnonzero(wy.any(axis=0))
+        used_x = np.flatnonzero(wx.any(axis=0))
+        block = self.coefficients[used_y[0]:used_y[-1] + 1, used_x[0]:used_x[-1] + 1]
+        return wy[:, used_y[0]:used_y[-1] + 1] @ block @ wx[:, used_x[0]:used_x[-1] + 1].T
+
+def smooth_noise(size, smoothness, seed=None):
+    """Low-resolution stand-in for gaussian_filter(rng.random((size, size)), smoothness), as float32."""
+    rng = np.random.default_rng(seed)
+    spacing = max(smoothness / LATTICE_OVERSAMPLE, 1.0)
+    return LatticeNoise((size, size), spacing, rng, sigma=smoothness).sample(slice(0, size), slice(0, size))
+
+class TerrainGenerator:
+    """
+    Forest and city layers of a size x size map, with the parameters and cell values of
+    Forest.generate_clumpy_forest and Forest_City.generate_large_cluster_city_matrix
+    (TREE / EMPTY forest; TREE or a 0-8 population density city), built tile by tile.
+    - Distance to the forest is exact up to `max_distance` cells and capped beyond it; each
+      tile is computed with a halo that wide, so memory is bounded by the tile size.
+    - The tree threshold and the normalizers come from a preview of at most PREVIEW_SIZE^2
+      cells, so tiles agree with each other without a pass over the full map.
+    """
+
+    def __init__(self, size, seed=None, clump_scale=35, tree_ratio=0.5, smoothness=50.0,
+                 distance_influence=0.2, center_bias=1.3, max_distance=DEFAULT_MAX_DISTANCE):
+        rng = np.random.default_rng(seed)
+        self.size = size
+        self.shape = (size, size)
+        self.tree_ratio = tree_ratio
+        self.distance_influence = distance_influence
+        self.center_bias = center_bias
+        self.max_distance = max_distance
+
+        # Same lattice spacing as generate_clumpy_forest's low-res noise
+        self.forest_noise = LatticeNoise(self.shape, size / max(1, int(size // clump_scale)), rng)
+        self.city_noise = LatticeNoise(self.shape, max(smoothness / LATTICE_OVERSAMPLE, 1.0), rng, sigma=smoothness)
+
+        # Center-bias normalizer: the farthest cell from the center is a corner
+        self.center = size // 2
+        self.center_max = np.hypot(*[max(self.center, size - 1 - self.center)] * 2) or 1.0
+
+        self._preview()
+
+    def _preview(self):
+        step = max(1, int(np.ceil(self.size / PREVIEW_SIZE)))
+        whole = slice(0, self.size)
+        forest_field = self.forest_noise.sample(whole, whole, step)
+        self.tree_threshold = np.percentile(forest_field, 100 * (1 - self.tree_ratio))
+
+        city_field = self.city_noise.sample(whole, whole, step)
+        self.city_range = (city_field.min(), city_field.max())
+
+        trees = forest_field > self.tree_threshold
+        distance = distance_transform_edt(~trees) * step if trees.any() else np.full(trees.shape, float(self.max_distance))
+        self.distance_max = min(distance.max(), self.max_distance) or 1.0
+
+        centers = np.arange(0, self.size, step)
+        density = self._density(city_field, distance, centers, centers)
+        self.density_max = density.max() or 1.0
+
+    def _density(self, city_field, distance, ys, xs):
+        low, high = self.city_range
+        smoothed_norm = np.clip((city_field - low) / (high - low), 0, 1)
+        distance_norm = np.minimum(distance, self.max_distance) / self.distance_max
+        distance_norm = np.clip(distance_norm, 0, 1).astype(np.float32)
+        dist_to_center = np.hypot(ys[:, None] - self.center, xs[None, :] - self.center).astype(np.float32)
+        center_bias_map = np.maximum(1 - dist_to_center / self.center_max, 0)
+        return smoothed_norm * distance_norm ** self.distance_influence * center_bias_map ** self.center_bias
+
+    def forest_tile(self, rows, cols):
+        """TREE / EMPTY cells of the block [rows] x [cols]."""
+        trees = self.forest_noise.sample(rows, cols) > self.tree_threshold
+        return np.where(trees, TREE, EMPTY).astype(np.int8)
+
+    def city_tile(self, rows, cols):
+        """City cells (TREE or a 0-8 density) of the block [rows] x [cols]."""
+        halo = self.max_distance
+        outer_rows = slice(max(rows.start - halo, 0), min(rows.stop + halo, self.size))
+        outer_cols = slice(max(cols.start - halo, 0), min(cols.stop + halo, self.size))
+        inner = (slice(rows.start - outer_rows.start, rows.stop - outer_rows.start),
+                 slice(cols.start - outer_cols.start, cols.stop - outer_cols.start))
+
+        trees = self.forest_noise.sample(outer_rows, outer_cols) > self.tree_threshold
+        if trees.any():
+            distance = distance_transform_edt(~trees)[inner]
+        else:
+            distance = np.full(trees[inner].shape, float(self.max_distance))
+        trees = trees[inner]
+
+        density = self._density(self.city_noise.sample(rows, cols), distance,
+                                np.arange(rows.start, rows.stop), np.arange(cols.start, cols.stop))
+        city = np.clip(density / self.density_max * 8, 0, 8).astype(np.int8)
+        city[trees] = TREE
+        return city
+
+    def tiles(self, tile_size=DEFAULT_TILE_SIZE, layer="city"):
+        """((y, x), block) pairs covering the map, the input of Fire_tiled.write_terrain_tiles."""
+        make = self.city_tile if layer == "city" else self.forest_tile
+        for y in range(0, self.size, tile_size):
+            for x in range(0, self.size, tile_size):
+                yield (y, x), make(slice(y, min(y + tile_size, self.size)), slice(x, min(x + tile_size, self.size)))
+
+    def forest(self):
+        return self.forest_tile(slice(0, self.size), slice(0, self.size))
+
+    def city(self):
+        return self.city_tile(slice(0, self.size), slice(0, self.size))